@@ -7,7 +7,17 @@ To run this application:
 2. Run the app: streamlit run app.py
 3. Open http://localhost:8501 in your browser
 
-Database: SQLite (document_analyzer.db) - automatically created on first run
+Command line export and batch ingestion (no browser needed):
+    python app.py export --format parquet --output analyses.parquet --since 2024-01-01
+    python app.py ingest --user user@demo.com tickets.tar.gz
+
+Database: SQLite (document_analyzer.db, or $DOCUMENT_ANALYZER_DB) - automatically created on first run
+Sharding: set $DOCUMENT_ANALYZER_SHARDS=N to spread analyses over N shard files
+(document_analyzer.shard0.db ...) by user; choose N before first run, existing
+databases are not resharded
+Profiling: set $DOCUMENT_ANALYZER_SLOW_MS to record cProfile profiles of slower analyses (Admin > Slow Analyses)
+Budgets: $DOCUMENT_ANALYZER_MAX_INPUT_MB, _MAX_PAGES, _MAX_TOKENS, _TIME_BUDGET (seconds) and
+_MAX_CONCURRENT (heavy analyses at once) bound each request; longer texts are sampled
 """
 
 import streamlit as st
@@ -16,9 +26,32 @@ import hashlib
 import uuid
 import re
 import json
+import csv
+import os
+import sys
+import tempfile
+import threading
+import functools
+import time
+import contextlib
+import cProfile
+import pstats
+import marshal
+from collections import OrderedDict, deque
+import heapq
+import itertools
+import math
+import zlib
+import zipfile
+import tarfile
+import codecs
+import mmap
+import xml.etree.ElementTree as ET
 from datetime import datetime
 import io
 import base64
+import numpy as np
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 # Page config
 st.set_page_config(
@@ -113,11 +146,238 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# ==================== QUERY CACHE ====================
+
+QUERY_CACHE_BYTES = 64 * 1024 * 1024   # estimated result bytes cached across sessions
+QUERY_CACHE_MAX_ENTRIES = 2048
+QUERY_CACHE_SYNC_SECONDS = 2           # how often writes from other processes are looked for
+
+class QueryCache:
+    """Process-wide LRU cache of DB helper results, invalidated by write generations
+    
+    Writes bump a global generation and, for writes that belong to a user, that
+    user's generation. A per-user result stays valid while its user's
+    generation is unchanged, a global one while the global generation is.
+    Writes made by other processes (e.g. python app.py ingest) are noticed
+    through data_token, read at most every sync_seconds: when it changes, a new
+    epoch starts and every entry is stale.
+    """
+    
+    def __init__(self, max_bytes=QUERY_CACHE_BYTES, max_entries=QUERY_CACHE_MAX_ENTRIES,
+                 data_token=None, sync_seconds=QUERY_CACHE_SYNC_SECONDS):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.data_token = data_token   # callable whose value changes when the database does
+        self.sync_seconds = sync_seconds
+        self._entries = OrderedDict()  # key -> (generation, stored_at, size, value)
+        self._bytes = 0
+        self._epoch = 0
+        self._token = None
+        self._synced_at = None
+        self._global_generation = 0
+        self._user_generations = {}
+        self._hits = self._misses = 0
+        self._lock = threading.Lock()
+    
+    def _sync(self):
+        """Start a new epoch if data_token shows writes made since the last check"""
+        now = time.monotonic()
+        with self._lock:
+            if self.data_token is None or (self._synced_at is not None
+                                           and now - self._synced_at < self.sync_seconds):
+                return
+            self._synced_at = now
+        token = self.data_token()
+        with self._lock:
+            if token != self._token:
+                # This process's own writes also move the token; that only costs an early refresh
+                if self._token is not None:
+                    self._epoch += 1
+                self._token = token
+    
+    def bump(self, user_id=None, shared=True):
+        """Invalidate results of a user and, unless shared is False, all global results"""
+        with self._lock:
+            if shared:
+                self._global_generation += 1
+            if user_id is not None:
+                self._user_generations[user_id] = self._user_generations.get(user_id, 0) + 1
+    
+    def get_or_compute(self, key, compute, user_id=None, max_age=None):
+        """Cached value for key, running compute() when it is missing or stale"""
+        self._sync()
+        with self._lock:
+            # Read before the query runs, so a write racing with it leaves the entry stale
+            generation = (self._epoch, self._global_generation if user_id is None
+                          else self._user_generations.get(user_id, 0))
+            entry = self._entries.get(key)
+            if (entry is not None and entry[0] == generation
+                    and (max_age is None or time.monotonic() - entry[1] < max_age)):
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[3]
+            self._misses += 1
+        
+        value = compute()
+        size = _estimate_size(value)
+        if size <= self.max_bytes // 8:
+            with self._lock:
+                old = self._entries.pop(key, None)
+                if old:
+                    self._bytes -= old[2]
+                self._entries[key] = (generation, time.monotonic(), size, value)
+                self._bytes += size
+                while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                    self._bytes -= self._entries.popitem(last=False)[1][2]
+        return value
+    
+    def usage(self):
+        """Summary of cache size and hit rate"""
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes,
+                    'hits': self._hits, 'misses': self._misses}
+
+def _estimate_size(value):
+    """Rough in-memory size of a query result in bytes (lists are sampled)"""
+    if hasattr(value, 'memory_usage'):  # DataFrame
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_estimate_size(item) for item in value.values())
+    if isinstance(value, (list, tuple)) and value:
+        sample = value[:16]
+        return sys.getsizeof(value) + len(value) * sum(_estimate_size(item) for item in sample) // len(sample)
+    return sys.getsizeof(value)
+
+def _freeze(value):
+    """Hashable form of query arguments"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+# feed_cursor (highest analysis id per shard) is defined with the DB helpers below
+@st.cache_resource
+def _server_query_cache():
+    return QueryCache(data_token=lambda: feed_cursor())
+
+# Outside `streamlit run` (CLI, load test) the module is imported once, so a plain global is shared
+_PROCESS_QUERY_CACHE = QueryCache(data_token=lambda: feed_cursor())
+
+def get_query_cache():
+    """Shared QueryCache for all sessions of this server process"""
+    return _server_query_cache() if get_script_run_ctx() else _PROCESS_QUERY_CACHE
+
+def cached_query(per_user=False, max_age=None):
+    """Serve a DB helper from the shared QueryCache
+    
+    With per_user the first argument is a user id and only that user's writes
+    invalidate the result; otherwise any write does. Callers must not mutate
+    the returned value.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__name__, _freeze(args), _freeze(kwargs))
+            return get_query_cache().get_or_compute(key, lambda: func(*args, **kwargs),
+                                                    args[0] if per_user else None, max_age)
+        return wrapper
+    return decorate
+
 # ==================== DATABASE ====================
 
+DB_PATH = os.environ.get('DOCUMENT_ANALYZER_DB', 'document_analyzer.db')
+DB_SHARDS = int(os.environ.get('DOCUMENT_ANALYZER_SHARDS', '1'))  # analysis shard files (1 = single file)
+DB_TIMEOUT = 5.0  # seconds to wait on a locked database
+
+class SQLiteStorage:
+    """Storage backend keeping users and analyses in one SQLite file
+    
+    DB helpers never open files directly: users live in the catalog database,
+    a user's analyses in the shard chosen by user_shard(), and admin-wide
+    queries run against every shard in shards() and merge the results.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.shard_paths = [path]
+    
+    @property
+    def shard_count(self):
+        return len(self.shard_paths)
+    
+    def connect(self, path):
+        return sqlite3.connect(path, timeout=DB_TIMEOUT)
+    
+    def catalog(self):
+        """Connection to the database holding users"""
+        return self.connect(self.path)
+    
+    def shard(self, index, with_users=False):
+        """Connection to an analysis shard, optionally with the catalog attached for joins on users
+        
+        Only attach for reads: BEGIN IMMEDIATE locks every attached database,
+        which would serialize writers on different shards again.
+        """
+        path = self.shard_paths[index]
+        conn = self.connect(path)
+        if with_users and path != self.path:
+            conn.execute("ATTACH DATABASE ? AS catalog", (self.path,))
+        return conn
+    
+    def shard_index_for_user(self, user_id):
+        return zlib.crc32(str(user_id).encode()) % self.shard_count
+    
+    def shard_index_for_analysis(self, analysis_id):
+        # Shard k only allocates ids congruent to k (see next_analysis_id)
+        return analysis_id % self.shard_count
+    
+    def user_shard(self, user_id):
+        return self.shard(self.shard_index_for_user(user_id))
+    
+    def analysis_shard(self, analysis_id):
+        return self.shard(self.shard_index_for_analysis(analysis_id))
+    
+    def shards(self, with_users=False):
+        return [self.shard(index, with_users) for index in range(self.shard_count)]
+    
+    def next_analysis_id(self, c, user_id):
+        """Next analysis id for the user's shard, unique across all shards"""
+        if self.shard_count == 1:
+            return None  # AUTOINCREMENT
+        c.execute("SELECT seq FROM sqlite_sequence WHERE name='analyses'")
+        row = c.fetchone()
+        next_id = (row[0] if row else 0) + 1
+        return next_id + (self.shard_index_for_user(user_id) - next_id) % self.shard_count
+
+class ShardedSQLiteStorage(SQLiteStorage):
+    """Storage backend routing analyses to N SQLite files by user id hash
+    
+    Users stay in the small catalog file, so every save_analysis only takes
+    the write lock of its own user's shard.
+    """
+    
+    def __init__(self, path, shards):
+        super().__init__(path)
+        base, ext = os.path.splitext(path)
+        self.shard_paths = [f'{base}.shard{index}{ext or ".db"}' for index in range(shards)]
+
+def make_storage(path=DB_PATH, shards=DB_SHARDS):
+    """Storage backend for the configured shard count"""
+    return ShardedSQLiteStorage(path, shards) if shards > 1 else SQLiteStorage(path)
+
+STORAGE = make_storage()
+
+def get_connection():
+    """Open a connection to the catalog (users) database"""
+    return STORAGE.catalog()
+
+SCHEMA_VERSION = 1  # PRAGMA user_version of a shard whose legacy JSON results were migrated
+
+@st.cache_resource
 def init_db():
-    """Initialize SQLite database"""
-    conn = sqlite3.connect('document_analyzer.db')
+    """Initialize SQLite database (once per server process, not on every rerun)"""
+    conn = get_connection()
     c = conn.cursor()
     
     # Users table
@@ -130,6 +390,31 @@ def init_db():
                   api_key TEXT UNIQUE NOT NULL,
                   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
     
+    # Create demo accounts if they don't exist
+    c.execute("SELECT COUNT(*) FROM users WHERE email='admin@demo.com'")
+    if c.fetchone()[0] == 0:
+        admin_api_key = 'admin-' + str(uuid.uuid4())
+        admin_pass = hashlib.sha256('admin123'.encode()).hexdigest()
+        c.execute("INSERT INTO users (name, email, password_hash, is_admin, api_key) VALUES (?, ?, ?, ?, ?)",
+                  ('Admin User', 'admin@demo.com', admin_pass, 1, admin_api_key))
+    
+    c.execute("SELECT COUNT(*) FROM users WHERE email='user@demo.com'")
+    if c.fetchone()[0] == 0:
+        user_api_key = 'user-' + str(uuid.uuid4())
+        user_pass = hashlib.sha256('user123'.encode()).hexdigest()
+        c.execute("INSERT INTO users (name, email, password_hash, is_admin, api_key) VALUES (?, ?, ?, ?, ?)",
+                  ('Regular User', 'user@demo.com', user_pass, 0, user_api_key))
+    
+    conn.commit()
+    conn.close()
+    
+    for conn in STORAGE.shards():
+        init_shard(conn.cursor())
+        conn.commit()
+        conn.close()
+
+def init_shard(c):
+    """Create the analysis tables of one shard"""
     # Analyses table
     c.execute('''CREATE TABLE IF NOT EXISTS analyses
                  (id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -154,27 +439,75 @@ def init_db():
                   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                   FOREIGN KEY (user_id) REFERENCES users (id))''')
     
-    # Create demo accounts if they don't exist
-    c.execute("SELECT COUNT(*) FROM users WHERE email='admin@demo.com'")
-    if c.fetchone()[0] == 0:
-        admin_api_key = 'admin-' + str(uuid.uuid4())
-        admin_pass = hashlib.sha256('admin123'.encode()).hexdigest()
-        c.execute("INSERT INTO users (name, email, password_hash, is_admin, api_key) VALUES (?, ?, ?, ?, ?)",
-                  ('Admin User', 'admin@demo.com', admin_pass, 1, admin_api_key))
-    
-    c.execute("SELECT COUNT(*) FROM users WHERE email='user@demo.com'")
-    if c.fetchone()[0] == 0:
-        user_api_key = 'user-' + str(uuid.uuid4())
-        user_pass = hashlib.sha256('user123'.encode()).hexdigest()
-        c.execute("INSERT INTO users (name, email, password_hash, is_admin, api_key) VALUES (?, ?, ?, ?, ?)",
-                  ('Regular User', 'user@demo.com', user_pass, 0, user_api_key))
-    
-    conn.commit()
+    # Corpus document-frequency index for TF-IDF keywords
+    c.execute('''CREATE TABLE IF NOT EXISTS term_df
+                 (term TEXT PRIMARY KEY,
+                  df INTEGER NOT NULL DEFAULT 0,
+                  last_seen INTEGER NOT NULL DEFAULT 0)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS corpus_stats
+                 (key TEXT PRIMARY KEY,
+                  value INTEGER NOT NULL DEFAULT 0)''')
+    c.execute("INSERT OR IGNORE INTO corpus_stats (key, value) VALUES ('documents', 0)")
+    
+    # Near-duplicate index: MinHash signatures and their LSH band buckets
+    c.execute('''CREATE TABLE IF NOT EXISTS minhash_signatures
+                 (analysis_id INTEGER PRIMARY KEY,
+                  user_id INTEGER NOT NULL,
+                  signature BLOB NOT NULL,
+                  FOREIGN KEY (analysis_id) REFERENCES analyses (id))''')
+    c.execute('''CREATE TABLE IF NOT EXISTS lsh_buckets
+                 (user_id INTEGER NOT NULL,
+                  band INTEGER NOT NULL,
+                  bucket BLOB NOT NULL,
+                  analysis_id INTEGER NOT NULL)''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_lsh_buckets ON lsh_buckets (user_id, band, bucket)")
+    
+    # Normalized analysis results for cross-analysis queries
+    c.execute('''CREATE TABLE IF NOT EXISTS analysis_entities
+                 (analysis_id INTEGER NOT NULL,
+                  position INTEGER NOT NULL,
+                  entity_text TEXT NOT NULL,
+                  entity_type TEXT NOT NULL,
+                  confidence REAL,
+                  FOREIGN KEY (analysis_id) REFERENCES analyses (id))''')
+    c.execute('''CREATE TABLE IF NOT EXISTS analysis_keywords
+                 (analysis_id INTEGER NOT NULL,
+                  position INTEGER NOT NULL,
+                  keyword TEXT NOT NULL,
+                  relevance REAL,
+                  FOREIGN KEY (analysis_id) REFERENCES analyses (id))''')
+    c.execute('''CREATE TABLE IF NOT EXISTS analysis_emotions
+                 (analysis_id INTEGER NOT NULL,
+                  emotion TEXT NOT NULL,
+                  score REAL,
+                  FOREIGN KEY (analysis_id) REFERENCES analyses (id))''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_analysis_entities_id ON analysis_entities (analysis_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_analysis_entities_type ON analysis_entities (entity_type, entity_text)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_analysis_keywords_id ON analysis_keywords (analysis_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_analysis_keywords_keyword ON analysis_keywords (keyword)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_analysis_emotions_id ON analysis_emotions (analysis_id, emotion)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_analyses_created ON analyses (created_at)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_analyses_user ON analyses (user_id, created_at)")
+    
+    c.execute("PRAGMA user_version")
+    if c.fetchone()[0] < SCHEMA_VERSION:
+        migrate_json_results(c)
+        c.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+def get_user_by_email(email):
+    """Look up a user by email without authenticating (command line tools)"""
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("SELECT id, name, email, is_admin FROM users WHERE email=?", (email,))
+    user = c.fetchone()
     conn.close()
+    if user:
+        return {'id': user[0], 'name': user[1], 'email': user[2], 'is_admin': bool(user[3])}
+    return None
 
 def get_user(email, password):
     """Authenticate user"""
-    conn = sqlite3.connect('document_analyzer.db')
+    conn = get_connection()
     c = conn.cursor()
     password_hash = hashlib.sha256(password.encode()).hexdigest()
     c.execute("SELECT * FROM users WHERE email=? AND password_hash=?", (email, password_hash))
@@ -192,7 +525,7 @@ def get_user(email, password):
 
 def create_user(name, email, password, is_admin=False):
     """Create new user"""
-    conn = sqlite3.connect('document_analyzer.db')
+    conn = get_connection()
     c = conn.cursor()
     password_hash = hashlib.sha256(password.encode()).hexdigest()
     api_key = str(uuid.uuid4())
@@ -201,60 +534,154 @@ def create_user(name, email, password, is_admin=False):
                   (name, email, password_hash, int(is_admin), api_key))
         conn.commit()
         conn.close()
+        get_query_cache().bump()
         return True
     except sqlite3.IntegrityError:
         conn.close()
         return False
 
-def save_analysis(user_id, source, text, analysis_types, results):
-    """Save analysis to database"""
-    conn = sqlite3.connect('document_analyzer.db')
+def save_analysis(user_id, source, text, analysis_types, results, signature=None, word_count=None):
+    """Save analysis to the user's shard and return its id
+    
+    Pass word_count when text is a sample of a longer document.
+    """
+    if signature is None:
+        signature = minhash_signature(text)
+    terms = keyword_terms(text)
+    
+    conn = STORAGE.user_shard(user_id)
     c = conn.cursor()
     
     sentiment = results.get('sentiment', {})
     language = results.get('language', {})
     
+    # Take the shard's write lock before allocating an id from its sequence
+    c.execute("BEGIN IMMEDIATE")
     c.execute("""INSERT INTO analyses 
-                 (user_id, source, text_preview, word_count, analysis_types,
+                 (id, user_id, source, text_preview, word_count, analysis_types,
                   sentiment_score, sentiment_label, sentiment_positive, sentiment_negative, sentiment_neutral,
                   language_code, language_name, language_confidence,
-                  emotions_json, entities_json, keywords_json, summary_text, summary_words)
-                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-              (user_id, source, text[:500], len(text.split()), ', '.join(analysis_types),
+                  summary_text, summary_words)
+                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+              (STORAGE.next_analysis_id(c, user_id), user_id, source, text[:500],
+               len(text.split()) if word_count is None else word_count,
+               ', '.join(analysis_types),
                sentiment.get('score'), sentiment.get('label'), sentiment.get('positive'),
                sentiment.get('negative'), sentiment.get('neutral'),
                language.get('code'), language.get('name'), language.get('confidence'),
-               json.dumps(results.get('emotions', {})), json.dumps(results.get('entities', [])),
-               json.dumps(results.get('keywords', [])), 
                results.get('summary', {}).get('summary'),
                results.get('summary', {}).get('summaryWords')))
     
+    analysis_id = c.lastrowid
+    save_result_rows(c, analysis_id, results.get('emotions', {}), results.get('entities', []),
+                     results.get('keywords', []))
+    
+    update_term_index(c, terms)
+    if signature is not None:
+        save_minhash(c, analysis_id, user_id, signature)
+    
     conn.commit()
     conn.close()
+    get_query_cache().bump(user_id)
+    return analysis_id
 
+@cached_query(per_user=True)
 def get_user_analyses(user_id):
     """Get all analyses for a user"""
-    conn = sqlite3.connect('document_analyzer.db')
+    conn = STORAGE.user_shard(user_id)
     c = conn.cursor()
     c.execute("SELECT * FROM analyses WHERE user_id=? ORDER BY created_at DESC", (user_id,))
     analyses = c.fetchall()
     conn.close()
     return analyses
 
-def get_all_analyses():
-    """Get all analyses (admin only)"""
-    conn = sqlite3.connect('document_analyzer.db')
-    c = conn.cursor()
-    c.execute("""SELECT a.*, u.name, u.email FROM analyses a 
-                 JOIN users u ON a.user_id = u.id 
-                 ORDER BY a.created_at DESC""")
-    analyses = c.fetchall()
-    conn.close()
-    return analyses
+# Admin grid columns (label, SQL expression); only these are fetched
+ADMIN_GRID_COLUMNS = [
+    ('ID', 'a.id'),
+    ('User', 'u.name'),
+    ('Email', 'u.email'),
+    ('Source', 'a.source'),
+    ('Analyses', 'a.analysis_types'),
+    ('Sentiment', 'a.sentiment_label'),
+    ('Score', 'a.sentiment_score'),
+    ('Words', 'a.word_count'),
+    ('Created', 'a.created_at'),
+]
+ADMIN_GRID_SORTS = ['Created', 'User', 'Email', 'Source', 'Sentiment', 'Score', 'Words']
+ADMIN_GRID_PAGE_ROWS = 500
+FEED_POLL_SECONDS = 5      # live update interval of the admin and history pages
+FEED_RECENT_ROWS = 50      # newest analyses listed in the admin live activity table
+HISTORY_PAGE_ROWS = 100    # newest analyses kept and listed on the history page
 
+def _analysis_filter(user_email=None, start_date=None, end_date=None, sentiment=None, search=None):
+    """WHERE clause and parameters over analyses a JOIN users u"""
+    clauses, params = [], []
+    if user_email:
+        clauses.append("u.email = ?")
+        params.append(user_email)
+    if start_date:
+        clauses.append("a.created_at >= ?")
+        params.append(str(start_date))
+    if end_date:
+        clauses.append("a.created_at < date(?, '+1 day')")
+        params.append(str(end_date))
+    if sentiment:
+        clauses.append("a.sentiment_label LIKE ?")
+        params.append(f'%{sentiment}%')
+    if search:
+        clauses.append("(u.name LIKE ? OR u.email LIKE ? OR a.source LIKE ?)")
+        params.extend([f'%{search}%'] * 3)
+    return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+@cached_query()
+def count_analyses(**filters):
+    """Number of analyses matching the admin grid filters"""
+    where, params = _analysis_filter(**filters)
+    total = 0
+    for conn in STORAGE.shards(with_users=True):
+        c = conn.cursor()
+        c.execute(f"SELECT COUNT(*) FROM analyses a JOIN users u ON a.user_id = u.id {where}", params)
+        total += c.fetchone()[0]
+        conn.close()
+    return total
+
+@cached_query()
+def get_admin_grid(sort='Created', descending=True, page=0, page_rows=ADMIN_GRID_PAGE_ROWS, **filters):
+    """One page of the admin analyses grid as a DataFrame
+    
+    Filtering, sorting and paging run in SQL. With several shards each one
+    returns the rows up to the end of the page, and the merged result is sliced.
+    """
+    import pandas as pd
+    if sort not in ADMIN_GRID_SORTS:
+        raise ValueError(f"Unsupported sort column: {sort}")
+    where, params = _analysis_filter(**filters)
+    direction = "DESC" if descending else "ASC"
+    sharded = STORAGE.shard_count > 1
+    offset = 0 if sharded else page * page_rows
+    limit = (page + 1) * page_rows if sharded else page_rows
+    
+    frames = []
+    for conn in STORAGE.shards(with_users=True):
+        frames.append(pd.read_sql_query(
+            f"""SELECT {', '.join(f'{expr} AS "{label}"' for label, expr in ADMIN_GRID_COLUMNS)}
+                FROM analyses a JOIN users u ON a.user_id = u.id
+                {where} ORDER BY "{sort}" {direction}, a.id {direction} LIMIT ? OFFSET ?""",
+            conn, params=params + [limit, offset]))
+        conn.close()
+    
+    grid = frames[0]
+    if sharded:
+        grid = pd.concat([frame for frame in frames if len(frame)] or frames[:1], ignore_index=True).sort_values(
+            [sort, 'ID'], ascending=not descending, na_position='last' if descending else 'first', kind='stable')
+        grid = grid.iloc[page * page_rows:limit].reset_index(drop=True)
+    grid['Created'] = pd.to_datetime(grid['Created'])
+    return grid
+
+@cached_query(per_user=True)
 def get_user_stats(user_id):
     """Get statistics for user"""
-    conn = sqlite3.connect('document_analyzer.db')
+    conn = STORAGE.user_shard(user_id)
     c = conn.cursor()
     c.execute("SELECT COUNT(*) FROM analyses WHERE user_id=?", (user_id,))
     total = c.fetchone()[0]
@@ -267,40 +694,875 @@ def get_user_stats(user_id):
     conn.close()
     return {'total': total, 'positive': positive, 'negative': negative, 'neutral': neutral}
 
-def get_admin_stats():
-    """Get admin statistics"""
-    conn = sqlite3.connect('document_analyzer.db')
+@cached_query()
+def get_admin_stats(cursor=None):
+    """Get admin statistics, optionally only over analyses up to a change feed cursor"""
+    conn = get_connection()
     c = conn.cursor()
     c.execute("SELECT COUNT(*) FROM users")
     total_users = c.fetchone()[0]
-    c.execute("SELECT COUNT(*) FROM analyses")
-    total_analyses = c.fetchone()[0]
-    c.execute("SELECT COUNT(*) FROM analyses WHERE sentiment_label LIKE '%Positive%'")
-    positive = c.fetchone()[0]
-    c.execute("SELECT COUNT(*) FROM analyses WHERE sentiment_label LIKE '%Negative%'")
-    negative = c.fetchone()[0]
     conn.close()
+    
+    total_analyses = positive = negative = 0
+    for index, conn in enumerate(STORAGE.shards()):
+        c = conn.cursor()
+        upto = (" AND id <= ?", (cursor[index],)) if cursor else ("", ())
+        c.execute("SELECT COUNT(*) FROM analyses WHERE 1=1" + upto[0], upto[1])
+        total_analyses += c.fetchone()[0]
+        c.execute("SELECT COUNT(*) FROM analyses WHERE sentiment_label LIKE '%Positive%'" + upto[0], upto[1])
+        positive += c.fetchone()[0]
+        c.execute("SELECT COUNT(*) FROM analyses WHERE sentiment_label LIKE '%Negative%'" + upto[0], upto[1])
+        negative += c.fetchone()[0]
+        conn.close()
     return {'totalUsers': total_users, 'totalAnalyses': total_analyses, 
             'positive': positive, 'negative': negative}
 
+def feed_cursor():
+    """Change feed position: the highest analysis id in each shard"""
+    cursor = []
+    for conn in STORAGE.shards():
+        cursor.append(conn.execute("SELECT COALESCE(MAX(id), 0) FROM analyses").fetchone()[0])
+        conn.close()
+    return cursor
+
+def get_analyses_since(cursor, user_id=None, limit=None):
+    """Analyses added after a change feed cursor, oldest first, and the advanced cursor
+    
+    Ids only grow within a shard, so a poll reads just the new rows through the
+    primary key. With user_id only that user's shard is read; with limit only
+    the newest limit rows are returned, though the cursor still moves to the head.
+    """
+    cursor = list(cursor)
+    indexes = range(STORAGE.shard_count) if user_id is None else [STORAGE.shard_index_for_user(user_id)]
+    rows = []
+    for index in indexes:
+        conn = STORAGE.shard(index)
+        c = conn.cursor()
+        # Read the head first so rows committed during the poll wait for the next one
+        c.execute("SELECT COALESCE(MAX(id), ?) FROM analyses", (cursor[index],))
+        head = c.fetchone()[0]
+        user_clause, params = ("", []) if user_id is None else (" AND user_id = ?", [user_id])
+        c.execute(f"""SELECT id, user_id, source, analysis_types, sentiment_label, word_count, created_at
+                      FROM analyses WHERE id > ? AND id <= ?{user_clause} ORDER BY id DESC LIMIT ?""",
+                  [cursor[index], head] + params + [-1 if limit is None else limit])
+        rows.extend({'id': row[0], 'user_id': row[1], 'source': row[2], 'analysis_types': row[3],
+                     'sentiment_label': row[4], 'word_count': row[5], 'created_at': row[6]}
+                    for row in c.fetchall())
+        conn.close()
+        cursor[index] = head
+    rows.sort(key=lambda row: (row['created_at'], row['id']))
+    return (rows if limit is None else rows[-limit:]), cursor
+
+def get_user_names(user_ids):
+    """Map user ids to (name, email)"""
+    user_ids = list(set(user_ids))
+    names = {}
+    conn = get_connection()
+    c = conn.cursor()
+    for start in range(0, len(user_ids), 900):
+        chunk = user_ids[start:start + 900]
+        c.execute(f"SELECT id, name, email FROM users WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+        names.update((row[0], (row[1], row[2])) for row in c.fetchall())
+    conn.close()
+    return names
+
 def clear_user_analyses(user_id):
     """Clear all analyses for a user"""
-    conn = sqlite3.connect('document_analyzer.db')
+    conn = STORAGE.user_shard(user_id)
     c = conn.cursor()
+    for table in ('analysis_entities', 'analysis_keywords', 'analysis_emotions'):
+        c.execute(f"DELETE FROM {table} WHERE analysis_id IN (SELECT id FROM analyses WHERE user_id=?)",
+                  (user_id,))
     c.execute("DELETE FROM analyses WHERE user_id=?", (user_id,))
+    c.execute("DELETE FROM minhash_signatures WHERE user_id=?", (user_id,))
+    c.execute("DELETE FROM lsh_buckets WHERE user_id=?", (user_id,))
     conn.commit()
     conn.close()
+    get_query_cache().bump(user_id)
 
 def regenerate_api_key(user_id):
     """Regenerate API key for user"""
-    conn = sqlite3.connect('document_analyzer.db')
+    conn = get_connection()
     c = conn.cursor()
     new_key = str(uuid.uuid4())
     c.execute("UPDATE users SET api_key=? WHERE id=?", (new_key, user_id))
     conn.commit()
     conn.close()
+    # No cached global query reads API keys
+    get_query_cache().bump(user_id, shared=False)
     return new_key
 
+TERM_INDEX_PRUNE_INTERVAL = 500  # documents between pruning passes
+TERM_INDEX_MIN_DF = 2             # terms rarer than this are pruned once stale
+
+def update_term_index(c, terms):
+    """Add a document's distinct terms to its shard's document-frequency index"""
+    c.execute("UPDATE corpus_stats SET value = value + 1 WHERE key='documents'")
+    c.execute("SELECT value FROM corpus_stats WHERE key='documents'")
+    doc_number = c.fetchone()[0]
+    
+    c.executemany("""INSERT INTO term_df (term, df, last_seen) VALUES (?, 1, ?)
+                     ON CONFLICT(term) DO UPDATE SET df = df + 1, last_seen = excluded.last_seen""",
+                  ((term, doc_number) for term in terms))
+    
+    # Drop rare terms that have not been seen for a full interval so the index
+    # stays proportional to the recurring vocabulary, not to every typo
+    if doc_number % TERM_INDEX_PRUNE_INTERVAL == 0:
+        c.execute("DELETE FROM term_df WHERE df < ? AND last_seen <= ?",
+                  (TERM_INDEX_MIN_DF, doc_number - TERM_INDEX_PRUNE_INTERVAL))
+
+def get_document_frequencies(terms):
+    """Look up corpus document count and document frequencies for the given terms"""
+    total_docs = 0
+    df = {}
+    terms = list(terms)
+    # Shards index disjoint documents, so counts add up
+    for conn in STORAGE.shards():
+        c = conn.cursor()
+        c.execute("SELECT value FROM corpus_stats WHERE key='documents'")
+        row = c.fetchone()
+        total_docs += row[0] if row else 0
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(terms), 900):
+            chunk = terms[i:i + 900]
+            c.execute(f"SELECT term, df FROM term_df WHERE term IN ({','.join('?' * len(chunk))})", chunk)
+            for term, count in c.fetchall():
+                df[term] = df.get(term, 0) + count
+        conn.close()
+    return total_docs, df
+
+def save_minhash(c, analysis_id, user_id, signature):
+    """Store a MinHash signature and its LSH band buckets"""
+    c.execute("INSERT INTO minhash_signatures (analysis_id, user_id, signature) VALUES (?, ?, ?)",
+              (analysis_id, user_id, signature.tobytes()))
+    c.executemany("INSERT INTO lsh_buckets (user_id, band, bucket, analysis_id) VALUES (?, ?, ?, ?)",
+                  ((user_id, band, bucket, analysis_id) for band, bucket in lsh_bands(signature)))
+
+def find_near_duplicate(user_id, signature, threshold=None):
+    """Find the user's most similar earlier analysis above the similarity threshold"""
+    if signature is None:
+        return None
+    threshold = NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold
+    
+    conn = STORAGE.user_shard(user_id)
+    c = conn.cursor()
+    # Candidates share at least one identical band with the signature
+    bands = lsh_bands(signature)
+    c.execute(f"""SELECT DISTINCT analysis_id FROM lsh_buckets WHERE user_id=? AND
+                  ({' OR '.join(['(band=? AND bucket=?)'] * len(bands))})""",
+              [user_id] + [value for band in bands for value in band])
+    candidates = [row[0] for row in c.fetchall()]
+    
+    best = None
+    for analysis_id in candidates:
+        c.execute("SELECT signature FROM minhash_signatures WHERE analysis_id=?", (analysis_id,))
+        row = c.fetchone()
+        if not row:
+            continue
+        similarity = float((np.frombuffer(row[0], dtype=np.uint32) == signature).mean())
+        if similarity >= threshold and (best is None or similarity > best[1]):
+            best = (analysis_id, similarity)
+    
+    duplicate = None
+    if best:
+        c.execute("SELECT source, analysis_types, created_at FROM analyses WHERE id=?", (best[0],))
+        row = c.fetchone()
+        if row:
+            duplicate = {'id': best[0], 'similarity': round(best[1], 2), 'source': row[0],
+                         'analysis_types': (row[1] or '').split(', '), 'created_at': row[2]}
+    conn.close()
+    return duplicate
+
+def get_analysis_results(analysis_id):
+    """Rebuild the results dict of a stored analysis"""
+    conn = STORAGE.analysis_shard(analysis_id)
+    c = conn.cursor()
+    c.execute("""SELECT analysis_types, word_count, sentiment_score, sentiment_label,
+                        sentiment_positive, sentiment_negative, sentiment_neutral,
+                        language_code, language_name, language_confidence,
+                        summary_text, summary_words
+                 FROM analyses WHERE id=?""", (analysis_id,))
+    row = c.fetchone()
+    if not row:
+        conn.close()
+        return {}
+    
+    types = (row[0] or '').split(', ')
+    results = {}
+    if 'sentiment' in types:
+        results['sentiment'] = {'score': row[2], 'label': row[3], 'confidence': round(abs(row[2]) * 100, 0),
+                                'positive': row[4], 'negative': row[5], 'neutral': row[6]}
+    if 'language' in types:
+        flag = LANGUAGE_PATTERNS.get(row[7], {}).get('flag', '🌍')
+        results['language'] = {'code': row[7], 'name': row[8], 'flag': flag, 'confidence': row[9]}
+    if 'emotions' in types:
+        c.execute("SELECT emotion, score FROM analysis_emotions WHERE analysis_id=? ORDER BY rowid",
+                  (analysis_id,))
+        results['emotions'] = dict(c.fetchall())
+    if 'entities' in types:
+        c.execute("""SELECT entity_text, entity_type, confidence FROM analysis_entities
+                     WHERE analysis_id=? ORDER BY position""", (analysis_id,))
+        results['entities'] = [{'text': text, 'type': entity_type, 'confidence': confidence}
+                               for text, entity_type, confidence in c.fetchall()]
+    if 'keywords' in types:
+        c.execute("SELECT keyword, relevance FROM analysis_keywords WHERE analysis_id=? ORDER BY position",
+                  (analysis_id,))
+        results['keywords'] = [{'text': keyword, 'relevance': relevance} for keyword, relevance in c.fetchall()]
+    if 'summary' in types:
+        results['summary'] = {'summary': row[10], 'originalWords': row[1], 'summaryWords': row[11]}
+    conn.close()
+    return results
+
+def save_result_rows(c, analysis_id, emotions, entities, keywords):
+    """Bulk insert emotions, entities and keywords into the normalized result tables"""
+    c.executemany("INSERT INTO analysis_emotions (analysis_id, emotion, score) VALUES (?, ?, ?)",
+                  ((analysis_id, emotion, score) for emotion, score in emotions.items()))
+    c.executemany("""INSERT INTO analysis_entities (analysis_id, position, entity_text, entity_type, confidence)
+                     VALUES (?, ?, ?, ?, ?)""",
+                  ((analysis_id, i, e['text'], e['type'], e.get('confidence')) for i, e in enumerate(entities)))
+    c.executemany("INSERT INTO analysis_keywords (analysis_id, position, keyword, relevance) VALUES (?, ?, ?, ?)",
+                  ((analysis_id, i, k['text'], k.get('relevance')) for i, k in enumerate(keywords)))
+
+def migrate_json_results(c, batch_size=500):
+    """Move legacy JSON result blobs into the normalized tables
+    
+    Each row is copied under a savepoint and its JSON columns are cleared only
+    if the whole copy succeeded; malformed rows keep their JSON untouched and
+    are reported on stderr. Returns the number of rows that could not be migrated.
+    """
+    last_id = failed = 0
+    while True:
+        c.execute("""SELECT id, emotions_json, entities_json, keywords_json FROM analyses
+                     WHERE id > ? AND (emotions_json IS NOT NULL OR entities_json IS NOT NULL
+                                       OR keywords_json IS NOT NULL)
+                     ORDER BY id LIMIT ?""", (last_id, batch_size))
+        rows = c.fetchall()
+        if not rows:
+            return failed
+        for analysis_id, emotions_json, entities_json, keywords_json in rows:
+            c.execute("SAVEPOINT migrate_row")
+            try:
+                save_result_rows(c, analysis_id, json.loads(emotions_json or '{}'),
+                                 json.loads(entities_json or '[]'), json.loads(keywords_json or '[]'))
+                c.execute("""UPDATE analyses SET emotions_json=NULL, entities_json=NULL, keywords_json=NULL
+                             WHERE id=?""", (analysis_id,))
+            except (ValueError, KeyError, TypeError, AttributeError, sqlite3.Error) as e:
+                c.execute("ROLLBACK TO migrate_row")
+                print(f"Kept legacy JSON of analysis {analysis_id}: {type(e).__name__}: {e}", file=sys.stderr)
+                failed += 1
+            c.execute("RELEASE migrate_row")
+        last_id = rows[-1][0]
+
+def _period_clause(days):
+    """SQL filter on analyses.created_at for the last N days (None = all time)"""
+    if days is None:
+        return "", []
+    return " AND a.created_at >= datetime('now', ?)", [f'-{int(days)} days']
+
+TOP_K_SHARD_FETCH = 4  # groups read per shard for each one wanted, when sharded
+
+def _sharded_top_k(shard_groups, limit, rank):
+    """Exact top-limit groups across shards without reading every group
+    
+    shard_groups(c, fetch=None, keys=None) returns {key: [count, *sums]} for
+    one shard: its fetch largest groups by count, or (at least) the given keys.
+    Each shard's largest groups are re-counted on every shard. A group no shard
+    returned has a count of at most the sum of each shard's smallest returned
+    count, so the fetch is widened until the top limit reach that bound.
+    """
+    fetch = limit if STORAGE.shard_count == 1 else limit * TOP_K_SHARD_FETCH
+    while True:
+        per_shard = []
+        for conn in STORAGE.shards():
+            per_shard.append(shard_groups(conn.cursor(), fetch=fetch))
+            conn.close()
+        exhausted = all(len(groups) < fetch for groups in per_shard)
+        bound = sum(min(values[0] for values in groups.values()) for groups in per_shard if len(groups) == fetch)
+        
+        if STORAGE.shard_count == 1:
+            totals = per_shard[0]
+        else:
+            keys = list(set().union(*per_shard))
+            totals = {}
+            for conn in STORAGE.shards():
+                c = conn.cursor()
+                # Stay under SQLite's bound-parameter limit
+                for i in range(0, len(keys), 900):
+                    chunk = keys[i:i + 900]
+                    wanted = set(chunk)
+                    for key, values in shard_groups(c, keys=chunk).items():
+                        if key in wanted:
+                            totals[key] = [a + b for a, b in zip(totals.get(key, [0] * len(values)), values)]
+                conn.close()
+        
+        top = heapq.nlargest(limit, totals.items(), key=rank)
+        if exhausted or top[-1][1][0] >= bound:
+            return top
+        fetch *= TOP_K_SHARD_FETCH
+
+@cached_query(max_age=60)  # period filters move with the clock
+def get_top_entities(entity_type=None, days=None, limit=10):
+    """Most frequent entities across all analyses"""
+    period, params = _period_clause(days)
+    type_clause = ""
+    if entity_type:
+        type_clause = " AND e.entity_type=?"
+        params.append(entity_type)
+    
+    def shard_groups(c, fetch=None, keys=None):
+        texts = sorted({text for text, _ in keys}) if keys else []
+        text_clause = f" AND e.entity_text IN ({','.join('?' * len(texts))})" if texts else ""
+        c.execute(f"""SELECT e.entity_text, e.entity_type, COUNT(*) AS mentions,
+                             COUNT(DISTINCT a.user_id) AS users
+                      FROM analysis_entities e JOIN analyses a ON a.id = e.analysis_id
+                      WHERE 1=1{period}{type_clause}{text_clause}
+                      GROUP BY e.entity_text, e.entity_type
+                      ORDER BY mentions DESC LIMIT ?""", params + texts + [fetch or -1])
+        # Each user lives in exactly one shard, so per-shard distinct user counts add up
+        return {(text, kind): [mentions, users] for text, kind, mentions, users in c.fetchall()}
+    
+    top = _sharded_top_k(shard_groups, limit, rank=lambda item: item[1][0])
+    return [{'entity': text, 'type': kind, 'mentions': mentions, 'users': users}
+            for (text, kind), (mentions, users) in top]
+
+@cached_query(max_age=60)
+def get_top_keywords(days=None, limit=10):
+    """Keywords extracted from the most analyses"""
+    period, params = _period_clause(days)
+    
+    def shard_groups(c, fetch=None, keys=None):
+        keys = list(keys or [])
+        keyword_clause = f" AND k.keyword IN ({','.join('?' * len(keys))})" if keys else ""
+        c.execute(f"""SELECT k.keyword, COUNT(*) AS analyses, SUM(k.relevance)
+                      FROM analysis_keywords k JOIN analyses a ON a.id = k.analysis_id
+                      WHERE 1=1{period}{keyword_clause}
+                      GROUP BY k.keyword
+                      ORDER BY analyses DESC LIMIT ?""", params + keys + [fetch or -1])
+        return {keyword: [count, relevance or 0] for keyword, count, relevance in c.fetchall()}
+    
+    top = _sharded_top_k(shard_groups, limit, rank=lambda item: (item[1][0], item[1][1] / item[1][0]))
+    return [{'keyword': keyword, 'analyses': count, 'avgRelevance': round(relevance / count, 1)}
+            for keyword, (count, relevance) in top]
+
+@cached_query(max_age=60)
+def get_emotion_distribution(days=None):
+    """Average score of each emotion across analyses"""
+    period, params = _period_clause(days)
+    totals = {}
+    for conn in STORAGE.shards():
+        c = conn.cursor()
+        c.execute(f"""SELECT m.emotion, SUM(m.score), COUNT(*)
+                      FROM analysis_emotions m JOIN analyses a ON a.id = m.analysis_id
+                      WHERE 1=1{period}
+                      GROUP BY m.emotion""", params)
+        for emotion, score, count in c.fetchall():
+            sums = totals.setdefault(emotion, [0.0, 0])
+            sums[0] += score or 0
+            sums[1] += count
+        conn.close()
+    return {emotion: {'average': round(score / count, 1), 'analyses': count}
+            for emotion, (score, count) in sorted(totals.items())}
+
+# ==================== EXPORT ====================
+
+EXPORT_COLUMNS = [('id', 'a.id', 'int64'), ('user_name', 'u.name', 'string'), ('user_email', 'u.email', 'string'),
+                  ('source', 'a.source', 'string'), ('text_preview', 'a.text_preview', 'string'),
+                  ('word_count', 'a.word_count', 'int64'), ('analysis_types', 'a.analysis_types', 'string'),
+                  ('sentiment_score', 'a.sentiment_score', 'float64'),
+                  ('sentiment_label', 'a.sentiment_label', 'string'),
+                  ('sentiment_positive', 'a.sentiment_positive', 'float64'),
+                  ('sentiment_negative', 'a.sentiment_negative', 'float64'),
+                  ('sentiment_neutral', 'a.sentiment_neutral', 'float64'),
+                  ('language_code', 'a.language_code', 'string'), ('language_name', 'a.language_name', 'string'),
+                  ('language_confidence', 'a.language_confidence', 'float64'),
+                  ('summary_text', 'a.summary_text', 'string'), ('summary_words', 'a.summary_words', 'int64'),
+                  ('created_at', 'a.created_at', 'string')]
+EXPORT_FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson', 'parquet': 'application/octet-stream'}
+EXPORT_CHUNK_ROWS = 5000          # rows fetched from the cursor per chunk
+EXPORT_DIR = 'exports'
+EXPORT_DOWNLOAD_LIMIT = 200 * 1024 * 1024  # larger exports are left on the server
+EXPORT_KEEP = 10                  # most recent admin exports kept in EXPORT_DIR
+
+def iter_analysis_chunks(user_email=None, start_date=None, end_date=None, sentiment=None,
+                         chunk_size=EXPORT_CHUNK_ROWS):
+    """Yield filtered analyses as lists of row tuples, chunk_size rows at a time"""
+    where, params = _analysis_filter(user_email, start_date, end_date, sentiment)
+    
+    def shard_rows(conn):
+        try:
+            c = conn.cursor()
+            # SQLite steps the statement lazily, so fetchmany never holds more than a chunk
+            c.execute(f"""SELECT {', '.join(expr for _, expr, _ in EXPORT_COLUMNS)}
+                          FROM analyses a JOIN users u ON a.user_id = u.id
+                          {where} ORDER BY a.id""", params)
+            while True:
+                rows = c.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+    
+    # Merge the per-shard streams by id, holding at most a chunk per shard
+    chunk = []
+    for row in heapq.merge(*(shard_rows(conn) for conn in STORAGE.shards(with_users=True)), key=lambda row: row[0]):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def export_analyses(out, fmt='csv', **filters):
+    """Stream filtered analyses to a binary file object as CSV, JSONL or Parquet; returns the row count"""
+    names = [name for name, _, _ in EXPORT_COLUMNS]
+    total = 0
+    
+    if fmt == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = pa.schema([(name, getattr(pa, kind)()) for name, _, kind in EXPORT_COLUMNS])
+        with pq.ParquetWriter(out, schema) as writer:
+            for rows in iter_analysis_chunks(**filters):
+                columns = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+                writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+                total += len(rows)
+        return total
+    
+    if fmt not in ('csv', 'jsonl'):
+        raise ValueError(f"Unsupported export format: {fmt}")
+    
+    text_out = io.TextIOWrapper(out, encoding='utf-8', newline='')
+    try:
+        if fmt == 'csv':
+            writer = csv.writer(text_out)
+            writer.writerow(names)
+        for rows in iter_analysis_chunks(**filters):
+            if fmt == 'csv':
+                writer.writerows(rows)
+            else:
+                text_out.writelines(json.dumps(dict(zip(names, row)), ensure_ascii=False) + '\n' for row in rows)
+            total += len(rows)
+    finally:
+        # Leave the caller's file object open
+        text_out.flush()
+        text_out.detach()
+    return total
+
+def prune_exports(keep=EXPORT_KEEP):
+    """Delete all but the newest keep admin exports from EXPORT_DIR"""
+    try:
+        paths = [entry.path for entry in os.scandir(EXPORT_DIR)
+                 if entry.is_file() and entry.name.startswith('analyses_')]
+    except FileNotFoundError:
+        return
+    for path in sorted(paths, key=os.path.getmtime, reverse=True)[keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # removed by another session meanwhile
+
+# ==================== SESSION STORAGE ====================
+
+SESSION_TEXT_BUDGET = 8 * 1024 * 1024       # compressed bytes kept in memory per session
+GLOBAL_TEXT_BUDGET = 256 * 1024 * 1024      # compressed bytes kept in memory across sessions
+GLOBAL_SPILL_BUDGET = 2 * 1024 * 1024 * 1024  # bytes spilled to disk across sessions
+TEXT_SPILL_BYTES = 1024 * 1024              # compressed texts larger than this go straight to disk
+
+class TextStore:
+    """Process-wide LRU store for large session texts
+    
+    Texts are zlib-compressed and addressed by handle. When a session or the
+    process exceeds its memory budget, the least recently used texts are
+    spilled to disk; when the disk budget is exceeded they are dropped.
+    """
+    
+    def __init__(self, session_budget=SESSION_TEXT_BUDGET, global_budget=GLOBAL_TEXT_BUDGET,
+                 spill_budget=GLOBAL_SPILL_BUDGET):
+        self.session_budget = session_budget
+        self.global_budget = global_budget
+        self.spill_budget = spill_budget
+        self.spill_dir = tempfile.mkdtemp(prefix='document_analyzer_')
+        self._entries = OrderedDict()  # handle -> {'session', 'size', 'data', 'path'}
+        self._memory = {}              # session -> in-memory bytes
+        self._lock = threading.Lock()
+    
+    def put(self, session_id, text):
+        """Store text for a session and return its handle"""
+        data = zlib.compress(text.encode('utf-8'), 6)
+        handle = uuid.uuid4().hex
+        entry = {'session': session_id, 'size': len(data), 'data': data, 'path': None}
+        with self._lock:
+            self._entries[handle] = entry
+            self._memory[session_id] = self._memory.get(session_id, 0) + entry['size']
+            if entry['size'] > TEXT_SPILL_BYTES:
+                self._spill(handle, entry)
+            self._enforce_budgets(session_id)
+        return handle
+    
+    def get(self, handle):
+        """Return the text for a handle, or None if it has been evicted"""
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is None:
+                return None
+            self._entries.move_to_end(handle)
+            data, path = entry['data'], entry['path']
+        if data is None:
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                return None
+        return zlib.decompress(data).decode('utf-8')
+    
+    def discard(self, handle):
+        """Forget a single text"""
+        with self._lock:
+            entry = self._entries.pop(handle, None)
+            if entry:
+                self._release(entry)
+    
+    def drop_session(self, session_id):
+        """Forget every text belonging to a session"""
+        with self._lock:
+            for handle in [h for h, e in self._entries.items() if e['session'] == session_id]:
+                self._release(self._entries.pop(handle))
+            self._memory.pop(session_id, None)
+    
+    def usage(self):
+        """Summary of memory and disk use"""
+        with self._lock:
+            entries = list(self._entries.values())
+        return {'entries': len(entries),
+                'sessions': len({e['session'] for e in entries}),
+                'memoryBytes': sum(e['size'] for e in entries if e['data'] is not None),
+                'diskBytes': sum(e['size'] for e in entries if e['data'] is None)}
+    
+    def _spill(self, handle, entry):
+        path = os.path.join(self.spill_dir, handle)
+        with open(path, 'wb') as f:
+            f.write(entry['data'])
+        self._memory[entry['session']] -= entry['size']
+        entry['data'], entry['path'] = None, path
+    
+    def _release(self, entry):
+        if entry['data'] is not None:
+            self._memory[entry['session']] = self._memory.get(entry['session'], 0) - entry['size']
+        elif entry['path']:
+            try:
+                os.remove(entry['path'])
+            except OSError:
+                pass
+    
+    def _enforce_budgets(self, session_id):
+        # Spill least recently used texts until both memory budgets are met
+        for handle, entry in list(self._entries.items()):
+            session_over = self._memory.get(session_id, 0) > self.session_budget
+            global_over = sum(self._memory.values()) > self.global_budget
+            if not (session_over or global_over):
+                break
+            if entry['data'] is not None and (global_over or entry['session'] == session_id):
+                self._spill(handle, entry)
+        
+        # Then drop the oldest spilled texts until the disk budget is met
+        spilled = sum(e['size'] for e in self._entries.values() if e['data'] is None)
+        for handle, entry in list(self._entries.items()):
+            if spilled <= self.spill_budget:
+                break
+            if entry['data'] is None:
+                spilled -= entry['size']
+                self._release(self._entries.pop(handle))
+
+@st.cache_resource
+def get_text_store():
+    """Shared TextStore for all sessions of this server process"""
+    return TextStore()
+
+def current_session_id():
+    """Streamlit session id, or a fixed id outside a script run"""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else 'local'
+
+def process_memory():
+    """Resident set size of this process in bytes (peak RSS where current RSS is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+# ==================== PROFILING ====================
+
+SLOW_ANALYSIS_MS = float(os.environ.get('DOCUMENT_ANALYZER_SLOW_MS', '0'))  # 0 keeps profiling off
+SLOW_ANALYSIS_DEFAULT_MS = 2000      # threshold offered when an admin switches profiling on
+SLOW_ANALYSIS_RECORDS = 20           # slow analyses kept, newest first
+SLOW_ANALYSIS_TOP_FUNCTIONS = 40     # functions listed in each record's summary
+
+class SlowAnalysisLog:
+    """Process-wide ring of the most recent slow analyses and their profiles
+    
+    While threshold_ms is positive, profile_analysis runs cProfile around every
+    analysis and records the ones that take at least that long.
+    """
+    
+    def __init__(self, threshold_ms=SLOW_ANALYSIS_MS, capacity=SLOW_ANALYSIS_RECORDS):
+        self.threshold_ms = threshold_ms
+        self._records = deque(maxlen=capacity)
+        self._next_id = 1
+        self._lock = threading.Lock()
+    
+    @property
+    def enabled(self):
+        return self.threshold_ms > 0
+    
+    def add(self, record):
+        with self._lock:
+            # A slow upload is re-extracted on every rerun; keep only its latest record
+            for old in [r for r in self._records if (r['kind'], r['sha256']) == (record['kind'], record['sha256'])]:
+                self._records.remove(old)
+            record['id'] = self._next_id
+            self._next_id += 1
+            self._records.appendleft(record)
+    
+    def records(self):
+        with self._lock:
+            return list(self._records)
+    
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+@st.cache_resource
+def _server_slow_analysis_log():
+    return SlowAnalysisLog()
+
+_PROCESS_SLOW_ANALYSIS_LOG = SlowAnalysisLog()
+
+def get_slow_analysis_log():
+    """Shared SlowAnalysisLog for all sessions of this server process"""
+    return _server_slow_analysis_log() if get_script_run_ctx() else _PROCESS_SLOW_ANALYSIS_LOG
+
+def _input_metadata(source, payload):
+    """Size, type and hash of an analysis input (text or uploaded file)"""
+    if isinstance(payload, str):
+        data, chars = payload.encode('utf-8', 'replace'), len(payload)
+    else:
+        data, chars = payload.getvalue() if hasattr(payload, 'getvalue') else b'', None
+    return {'type': source.rsplit('.', 1)[-1].lower() if '.' in source else 'text',
+            'bytes': len(data), 'chars': chars, 'sha256': hashlib.sha256(data).hexdigest()}
+
+# From Python 3.12 cProfile is built on sys.monitoring: one profiler per process,
+# and it sees every thread. Profiles are therefore taken one at a time.
+_PROFILER_LOCK = threading.Lock()
+_PROFILE_CAVEAT = ("Python 3.12+ profiles every thread: functions run by other sessions at the same time "
+                   "may appear below.\n\n" if sys.version_info >= (3, 12) else "")
+
+def _start_profiler():
+    """Return an enabled cProfile.Profile holding _PROFILER_LOCK, or None if profiling is busy"""
+    if not _PROFILER_LOCK.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:  # a profiler from outside the app (e.g. python -m cProfile) is active
+        _PROFILER_LOCK.release()
+        return None
+    return profiler
+
+@contextlib.contextmanager
+def profile_analysis(kind, source, payload=None, analysis_types=()):
+    """Time the enclosed analysis, profiling it when possible, and log it when it exceeds the slow threshold
+    
+    While another analysis is being profiled the block is only timed, and a
+    slow run is logged without a profile. Enter it after admit_analysis so
+    queue wait is not counted.
+    """
+    log = get_slow_analysis_log()
+    if not log.enabled:
+        yield
+        return
+    
+    profiler = _start_profiler()
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _PROFILER_LOCK.release()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms >= log.threshold_ms:
+            if profiler is None:
+                summary, profile = "Timing only: another analysis was being profiled at the same time.", None
+            else:
+                out = io.StringIO()
+                stats = pstats.Stats(profiler, stream=out)
+                stats.sort_stats('cumulative').print_stats(SLOW_ANALYSIS_TOP_FUNCTIONS)
+                summary, profile = _PROFILE_CAVEAT + out.getvalue(), marshal.dumps(stats.stats)
+            log.add({'kind': kind, 'source': source, **_input_metadata(source, payload or ''),
+                     'analysisTypes': list(analysis_types), 'milliseconds': round(elapsed_ms),
+                     'thresholdMs': log.threshold_ms, 'error': error,
+                     'createdAt': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                     'summary': summary, 'profile': profile})
+
+# ==================== ADMISSION CONTROL ====================
+
+MAX_INPUT_BYTES = int(os.environ.get('DOCUMENT_ANALYZER_MAX_INPUT_MB', '50')) * 1024 * 1024  # per upload / text
+MAX_PDF_PAGES = int(os.environ.get('DOCUMENT_ANALYZER_MAX_PAGES', '1000'))     # pages extracted per PDF
+MAX_TABLE_ROWS = 100000                                                         # rows read per spreadsheet or CSV
+MAX_ANALYSIS_TOKENS = int(os.environ.get('DOCUMENT_ANALYZER_MAX_TOKENS', '200000'))  # longer texts are sampled
+ANALYSIS_TIME_BUDGET = float(os.environ.get('DOCUMENT_ANALYZER_TIME_BUDGET', '60'))  # seconds per request
+MAX_CONCURRENT_ANALYSES = int(os.environ.get('DOCUMENT_ANALYZER_MAX_CONCURRENT', str(os.cpu_count() or 2)))
+HEAVY_ANALYSIS_TOKENS = 20000   # texts at least this long need an analysis slot
+ADMISSION_QUEUE_TIMEOUT = 30    # seconds to wait for a slot before analyzing a HEAVY_ANALYSIS_TOKENS sample
+SAMPLE_WINDOWS = 32             # evenly spaced windows a sampled text is built from
+TOKEN_ESTIMATE_CHARS = 65536    # prefix used to estimate the words in a text
+CHARS_PER_WORD = 8              # budgets count at least one word per this many characters (prose averages 6-7)
+
+class AdmissionController:
+    """Caps the heavy analyses running at once with a queue that is fair across users
+    
+    A freed slot goes to the waiting user with the fewest analyses running and,
+    among those, the one served longest ago (round-robin), oldest request first,
+    so one user's large batch cannot starve everyone else.
+    """
+    
+    def __init__(self, slots=MAX_CONCURRENT_ANALYSES):
+        self.slots = slots
+        self._running = {}   # user_id -> analyses holding a slot
+        self._waiting = []   # (ticket, user_id) in arrival order
+        self._next_ticket = 0
+        self._served = {}    # user_id -> ticket of their last granted request, while it matters for fairness
+        self._cond = threading.Condition()
+        self.admitted = self.timed_out = self.sampled = 0
+    
+    def _granted(self, entry):
+        if sum(self._running.values()) >= self.slots:
+            return False
+        return entry == min(self._waiting, key=lambda w: (self._running.get(w[1], 0),
+                                                          self._served.get(w[1], -1), w[0]))
+    
+    def _forget_served(self):
+        # Once the queue drains, only users still holding a slot need to wait their turn
+        if not self._waiting:
+            self._served = {user: ticket for user, ticket in self._served.items() if user in self._running}
+    
+    @contextlib.contextmanager
+    def slot(self, user_id, timeout=ADMISSION_QUEUE_TIMEOUT):
+        """Hold a slot for the enclosed block; yields False if none freed up within timeout"""
+        with self._cond:
+            entry = (self._next_ticket, user_id)
+            self._next_ticket += 1
+            self._waiting.append(entry)
+            admitted = self._cond.wait_for(lambda: self._granted(entry), timeout)
+            self._waiting.remove(entry)
+            if admitted:
+                self._running[user_id] = self._running.get(user_id, 0) + 1
+                self._served[user_id] = entry[0]
+                self.admitted += 1
+            else:
+                self.timed_out += 1
+            self._forget_served()
+            # The queue head changed either way
+            self._cond.notify_all()
+        try:
+            yield admitted
+        finally:
+            if admitted:
+                with self._cond:
+                    self._running[user_id] -= 1
+                    if not self._running[user_id]:
+                        del self._running[user_id]
+                    self._forget_served()
+                    self._cond.notify_all()
+    
+    def count_sampled(self):
+        with self._cond:
+            self.sampled += 1
+    
+    def usage(self):
+        with self._cond:
+            return {'slots': self.slots, 'running': sum(self._running.values()), 'waiting': len(self._waiting),
+                    'admitted': self.admitted, 'timedOut': self.timed_out, 'sampled': self.sampled}
+
+@st.cache_resource
+def _server_admission_controller():
+    return AdmissionController()
+
+_PROCESS_ADMISSION_CONTROLLER = AdmissionController()
+
+def get_admission_controller():
+    """Shared AdmissionController for all sessions of this server process"""
+    return _server_admission_controller() if get_script_run_ctx() else _PROCESS_ADMISSION_CONTROLLER
+
+def estimate_tokens(text):
+    """Approximate word count, extrapolated from a prefix so huge texts are never split in full"""
+    if len(text) <= TOKEN_ESTIMATE_CHARS:
+        return len(text.split())
+    prefix = text[:TOKEN_ESTIMATE_CHARS]
+    return round(len(prefix.split()) * len(text) / len(prefix))
+
+def analysis_size(text, tokens=None):
+    """Size of text for the analysis budgets: its words, but at least one per CHARS_PER_WORD characters
+    
+    Text with few spaces (CJK, base64, minified JSON) costs as much to analyze
+    as its length suggests, however few words split() finds in it.
+    """
+    return max(estimate_tokens(text) if tokens is None else tokens, len(text) // CHARS_PER_WORD)
+
+def sample_text(text, max_tokens, tokens=None):
+    """Evenly spaced windows of text totalling about max_tokens words (see analysis_size), cut at whitespace"""
+    tokens = tokens or analysis_size(text)
+    if tokens <= max_tokens:
+        return text
+    stride = len(text) // SAMPLE_WINDOWS
+    width = max(1, len(text) * max_tokens // tokens // SAMPLE_WINDOWS)
+    windows = []
+    for i in range(SAMPLE_WINDOWS):
+        start = i * stride
+        if start:
+            start = text.find(' ', start) + 1 or start
+        end = text.rfind(' ', start, start + width)
+        windows.append(text[start:end if end > start else start + width].strip())
+    return '\n\n'.join(window for window in windows if window)
+
+@contextlib.contextmanager
+def admit_analysis(user_id, text):
+    """Apply the per-request budgets to text and hold an analysis slot while the block runs
+    
+    Yields a plan dict: 'text' is what to analyze - text itself, or an evenly
+    spaced sample when its analysis_size is over MAX_ANALYSIS_TOKENS or no slot
+    freed up in time - 'tokens' the estimated words in text, 'deadline' the
+    time.monotonic() after which no further analysis should start, and 'notes'
+    what was degraded.
+    """
+    controller = get_admission_controller()
+    tokens = estimate_tokens(text)
+    size = analysis_size(text, tokens)
+    plan = {'text': text, 'tokens': tokens, 'notes': [], 'deadline': None}
+    if size > MAX_ANALYSIS_TOKENS:
+        plan['text'] = sample_text(text, MAX_ANALYSIS_TOKENS, size)
+        plan['notes'].append(f"Analyzed an evenly spaced ~{MAX_ANALYSIS_TOKENS:,}-word sample "
+                             f"of ~{size:,} words")
+    
+    admission = controller.slot(user_id) if size >= HEAVY_ANALYSIS_TOKENS else contextlib.nullcontext(True)
+    with admission as admitted:
+        if not admitted:
+            plan['text'] = sample_text(plan['text'], HEAVY_ANALYSIS_TOKENS)
+            plan['notes'] = [f"Server busy - analyzed an evenly spaced ~{HEAVY_ANALYSIS_TOKENS:,}-word sample "
+                             f"of ~{size:,} words"]
+        if plan['notes']:
+            controller.count_sampled()
+        plan['deadline'] = time.monotonic() + ANALYSIS_TIME_BUDGET
+        yield plan
+
 # ==================== TEXT ANALYSIS FUNCTIONS ====================
 
 POSITIVE_WORDS = ['good', 'great', 'excellent', 'amazing', 'wonderful', 'fantastic', 'awesome', 
@@ -334,15 +1596,387 @@ EMOTION_WORDS = {
                 'nasty', 'awful', 'terrible', 'horrible', 'offensive']
 }
 
+STOP_WORDS = {'the', 'and', 'for', 'are', 'was', 'but', 'not', 'you', 'all', 'any', 'can',
+              'had', 'her', 'his', 'him', 'its', 'our', 'out', 'she', 'has', 'who', 'how',
+              'may', 'did', 'too', 'use', 'way', 'yet', 'own', 'off', 'per', 'via', 'etc',
+              'this', 'that', 'with', 'from', 'have', 'been', 'were', 'they',
+              'their', 'what', 'when', 'where', 'which', 'while', 'about',
+              'would', 'there', 'could', 'other', 'after', 'first', 'also',
+              'made', 'many', 'before', 'being', 'through', 'just', 'over',
+              'such', 'into', 'year', 'some', 'them', 'than', 'then', 'only'}
+
+SUMMARY_LENGTHS = {'short': 3, 'medium': 6, 'long': 10}
+
 LANGUAGE_PATTERNS = {
-    'en': {'name': 'English', 'flag': '🇬🇧', 'words': ['the', 'is', 'are', 'was', 'were', 'have', 'has', 'been', 'being', 'and', 'or', 'but', 'with', 'for', 'that', 'this']},
-    'es': {'name': 'Spanish', 'flag': '🇪🇸', 'words': ['el', 'la', 'los', 'las', 'de', 'en', 'que', 'es', 'por', 'con', 'para', 'como', 'pero', 'más', 'este', 'esta']},
-    'fr': {'name': 'French', 'flag': '🇫🇷', 'words': ['le', 'la', 'les', 'de', 'du', 'des', 'et', 'est', 'que', 'qui', 'dans', 'pour', 'pas', 'sur', 'avec', 'plus']},
-    'de': {'name': 'German', 'flag': '🇩🇪', 'words': ['der', 'die', 'das', 'und', 'ist', 'von', 'mit', 'für', 'auf', 'nicht', 'auch', 'als', 'eine', 'aber', 'oder']},
-    'it': {'name': 'Italian', 'flag': '🇮🇹', 'words': ['il', 'la', 'di', 'che', 'non', 'per', 'una', 'sono', 'con', 'come', 'anche', 'più', 'del', 'della']},
-    'pt': {'name': 'Portuguese', 'flag': '🇵🇹', 'words': ['o', 'a', 'os', 'as', 'de', 'que', 'em', 'para', 'com', 'não', 'uma', 'por', 'mais', 'como']},
+    'en': {'name': 'English', 'flag': '🇬🇧', 'words': ['the', 'of', 'and', 'to', 'in', 'is', 'that', 'it', 'was', 'for', 'on', 'are', 'with', 'as', 'be', 'this', 'have', 'from', 'or', 'by', 'not', 'but', 'what', 'all', 'were', 'when', 'we', 'there', 'can', 'an', 'which', 'their', 'has', 'been', 'would', 'will', 'they', 'you', 'he', 'she', 'his', 'her', 'about', 'more', 'other', 'these', 'some', 'should', 'because', 'through', 'being', 'thing', 'know', 'think']},
+    'es': {'name': 'Spanish', 'flag': '🇪🇸', 'words': ['el', 'la', 'los', 'las', 'de', 'en', 'que', 'es', 'por', 'con', 'para', 'como', 'pero', 'más', 'este', 'esta', 'y', 'del', 'se', 'un', 'una', 'no', 'su', 'al', 'lo', 'sus', 'le', 'ya', 'porque', 'entre', 'cuando', 'muy', 'sin', 'sobre', 'también', 'hasta', 'hay', 'donde', 'quien', 'desde', 'todo', 'nos', 'durante', 'todos', 'ellos', 'esto', 'otro', 'mucho', 'nada', 'estar', 'algo', 'nosotros', 'años', 'gobierno', 'ciudad']},
+    'fr': {'name': 'French', 'flag': '🇫🇷', 'words': ['le', 'la', 'les', 'de', 'du', 'des', 'et', 'est', 'que', 'qui', 'dans', 'pour', 'pas', 'sur', 'avec', 'plus', 'en', 'un', 'une', 'par', 'au', 'ne', 'se', 'ce', 'il', 'sont', 'mais', 'comme', 'on', 'ou', 'nous', 'vous', 'elle', 'leur', 'aux', 'cette', 'été', 'être', 'fait', 'tout', 'aussi', 'très', 'sans', 'bien', 'où', 'même', 'peut', 'ils', 'ces', 'était', 'avoir', 'son', 'ses', 'aujourd', 'quelque', 'chose']},
+    'de': {'name': 'German', 'flag': '🇩🇪', 'words': ['der', 'die', 'das', 'und', 'ist', 'von', 'mit', 'für', 'auf', 'nicht', 'auch', 'als', 'eine', 'aber', 'oder', 'in', 'den', 'zu', 'sich', 'des', 'im', 'dem', 'ein', 'es', 'an', 'werden', 'aus', 'er', 'hat', 'dass', 'sie', 'nach', 'wird', 'bei', 'einer', 'um', 'sind', 'noch', 'wie', 'einem', 'über', 'einen', 'zum', 'war', 'haben', 'nur', 'vor', 'zur', 'mehr', 'durch', 'sein', 'wurde', 'ich', 'wir', 'können', 'schon', 'wenn', 'zwischen', 'gegen']},
+    'it': {'name': 'Italian', 'flag': '🇮🇹', 'words': ['il', 'la', 'di', 'che', 'non', 'per', 'una', 'sono', 'con', 'come', 'anche', 'più', 'del', 'della', 'e', 'in', 'un', 'è', 'le', 'si', 'da', 'gli', 'al', 'ma', 'nel', 'lo', 'questo', 'ha', 'dei', 'alla', 'se', 'ci', 'delle', 'essere', 'stato', 'loro', 'cui', 'quando', 'molto', 'nella', 'suo', 'sua', 'tutti', 'perché', 'dopo', 'ancora', 'fatto', 'solo', 'sempre', 'questa', 'quello', 'degli', 'anni', 'cosa']},
+    'pt': {'name': 'Portuguese', 'flag': '🇵🇹', 'words': ['o', 'a', 'os', 'as', 'de', 'que', 'em', 'para', 'com', 'não', 'uma', 'por', 'mais', 'como', 'e', 'do', 'da', 'um', 'é', 'no', 'se', 'na', 'dos', 'mas', 'foi', 'ao', 'ele', 'das', 'tem', 'seu', 'sua', 'ou', 'ser', 'quando', 'muito', 'há', 'nos', 'já', 'está', 'eu', 'também', 'só', 'pelo', 'pela', 'até', 'isso', 'ela', 'entre', 'depois', 'sem', 'mesmo', 'você', 'então', 'ainda', 'são', 'governo', 'ações']},
+    'nl': {'name': 'Dutch', 'flag': '🇳🇱', 'words': ['de', 'en', 'van', 'het', 'een', 'in', 'is', 'dat', 'op', 'te', 'zijn', 'met', 'voor', 'niet', 'aan', 'er', 'die', 'maar', 'om', 'ook', 'als', 'dan', 'bij', 'of', 'uit', 'nog', 'worden', 'door', 'naar', 'werd', 'heeft', 'was', 'hij', 'ze', 'zij', 'wij', 'ik', 'je', 'wordt', 'kan', 'deze', 'dit', 'meer', 'geen', 'wel', 'zo', 'tot', 'over', 'hebben', 'moet', 'veel', 'zou', 'waar', 'omdat', 'gemeente', 'jaar']},
+    'sv': {'name': 'Swedish', 'flag': '🇸🇪', 'words': ['och', 'i', 'att', 'det', 'som', 'en', 'på', 'är', 'av', 'för', 'med', 'till', 'den', 'har', 'de', 'inte', 'om', 'ett', 'han', 'men', 'var', 'jag', 'sig', 'från', 'vi', 'så', 'kan', 'när', 'år', 'säger', 'hon', 'under', 'också', 'efter', 'eller', 'nu', 'sin', 'där', 'vid', 'mot', 'ska', 'skulle', 'kommer', 'ut', 'får', 'finns', 'vara', 'hade', 'alla', 'andra', 'mycket', 'än', 'här', 'då', 'sedan', 'över', 'bara', 'vad', 'hur']},
+    'da': {'name': 'Danish', 'flag': '🇩🇰', 'words': ['og', 'i', 'at', 'det', 'er', 'en', 'til', 'på', 'de', 'af', 'med', 'for', 'den', 'som', 'ikke', 'har', 'et', 'var', 'jeg', 'han', 'der', 'om', 'men', 'så', 'sig', 'fra', 'vi', 'kan', 'hun', 'også', 'efter', 'eller', 'nu', 'over', 'skal', 'ved', 'når', 'havde', 'være', 'blev', 'bliver', 'mange', 'meget', 'hvor', 'hvad', 'hvis', 'dem', 'deres', 'mig', 'kun', 'kunne', 'ud', 'op', 'noget', 'sådan', 'hvordan']},
+    'no': {'name': 'Norwegian', 'flag': '🇳🇴', 'words': ['og', 'i', 'det', 'er', 'som', 'på', 'en', 'til', 'å', 'av', 'for', 'med', 'at', 'har', 'den', 'de', 'ikke', 'om', 'et', 'var', 'jeg', 'han', 'men', 'så', 'seg', 'fra', 'vi', 'kan', 'hun', 'også', 'etter', 'eller', 'nå', 'over', 'skal', 'ved', 'når', 'hadde', 'være', 'ble', 'blir', 'mange', 'mye', 'hvor', 'hva', 'hvis', 'dem', 'deres', 'meg', 'bare', 'kunne', 'ut', 'opp', 'noe', 'slik', 'hvordan', 'ikkje']},
+    'fi': {'name': 'Finnish', 'flag': '🇫🇮', 'words': ['ja', 'on', 'ei', 'se', 'että', 'hän', 'oli', 'ole', 'olla', 'mutta', 'kun', 'niin', 'tai', 'joka', 'myös', 'kuin', 'ovat', 'sen', 'hänen', 'tämä', 'mitä', 'jos', 'vain', 'ollut', 'nyt', 'sitten', 'minä', 'sinä', 'me', 'te', 'he', 'kanssa', 'jo', 'voi', 'kaikki', 'olen', 'siitä', 'mukaan', 'vielä', 'koska', 'vuoden', 'sekä', 'yli', 'ennen', 'jälkeen', 'paljon', 'hyvin', 'aina', 'täällä', 'missä', 'suomen', 'kaupunki']},
+    'pl': {'name': 'Polish', 'flag': '🇵🇱', 'words': ['i', 'w', 'nie', 'na', 'się', 'z', 'do', 'to', 'że', 'a', 'o', 'jak', 'ale', 'po', 'co', 'jest', 'tak', 'za', 'od', 'przez', 'jego', 'czy', 'już', 'być', 'tylko', 'jej', 'dla', 'był', 'może', 'które', 'która', 'który', 'jeszcze', 'bardzo', 'też', 'tym', 'ich', 'gdy', 'są', 'oraz', 'będzie', 'można', 'przed', 'między', 'także', 'więc', 'kiedy', 'bez', 'tego', 'jednak', 'przy', 'roku', 'życie']},
+    'cs': {'name': 'Czech', 'flag': '🇨🇿', 'words': ['a', 'se', 'na', 'v', 'je', 'že', 'to', 's', 'z', 'do', 'o', 'jako', 'ale', 'by', 'k', 'jsou', 'jeho', 'pro', 'tak', 'které', 'který', 'která', 'po', 'jak', 'byl', 'bylo', 'jsem', 'už', 'od', 'jen', 'nebo', 'při', 'této', 'také', 'však', 'jejich', 'mezi', 'když', 'může', 'být', 'podle', 'ještě', 'než', 'až', 'bude', 'velmi', 'tento', 'před', 'řekl', 'něco', 'český', 'všechny']},
+    'tr': {'name': 'Turkish', 'flag': '🇹🇷', 'words': ['ve', 'bir', 'bu', 'da', 'de', 'için', 'ile', 'çok', 'ne', 'gibi', 'daha', 'olarak', 'olan', 'kadar', 'sonra', 'ama', 'en', 'her', 'o', 'var', 'yok', 'ben', 'sen', 'biz', 'onlar', 'değil', 'şey', 'ise', 'mi', 'diye', 'göre', 'olduğu', 'büyük', 'yeni', 'ilk', 'iki', 'zaman', 'şekilde', 'ancak', 'bütün', 'veya', 'hem', 'bile', 'önce', 'nasıl', 'neden', 'çünkü', 'oldu', 'olduğunu', 'türkiye']},
+    'id': {'name': 'Indonesian', 'flag': '🇮🇩', 'words': ['yang', 'dan', 'di', 'itu', 'dengan', 'untuk', 'tidak', 'ini', 'dari', 'dalam', 'akan', 'pada', 'juga', 'saya', 'ke', 'karena', 'tersebut', 'bisa', 'ada', 'mereka', 'lebih', 'kami', 'sudah', 'atau', 'telah', 'oleh', 'seperti', 'hanya', 'harus', 'bahwa', 'kita', 'orang', 'masih', 'jika', 'sangat', 'setelah', 'banyak', 'dapat', 'kepada', 'sebagai', 'baru', 'sehingga', 'namun', 'belum', 'para', 'lain', 'menjadi', 'melakukan', 'pemerintah']},
+    'ro': {'name': 'Romanian', 'flag': '🇷🇴', 'words': ['și', 'de', 'în', 'a', 'la', 'cu', 'nu', 'se', 'pe', 'care', 'un', 'o', 'din', 'pentru', 'mai', 'că', 'este', 'sunt', 'au', 'al', 'fost', 'ce', 'sau', 'lui', 'ca', 'dar', 'fi', 'prin', 'ei', 'am', 'acest', 'această', 'foarte', 'după', 'doar', 'când', 'dacă', 'atunci', 'acum', 'către', 'toate', 'fără', 'unde', 'despre', 'cum', 'între', 'ani', 'țării', 'oameni']},
+    'hu': {'name': 'Hungarian', 'flag': '🇭🇺', 'words': ['a', 'az', 'és', 'hogy', 'nem', 'is', 'egy', 'meg', 'de', 'van', 'volt', 'ez', 'csak', 'már', 'mint', 'ki', 'el', 'még', 'azt', 'fel', 'vagy', 'lesz', 'kell', 'mert', 'ha', 'most', 'pedig', 'lehet', 'nagyon', 'minden', 'után', 'között', 'amely', 'amikor', 'sem', 'ami', 'akkor', 'így', 'alatt', 'szerint', 'több', 'úgy', 'vannak', 'neki', 'ezt', 'őket', 'magyar', 'évben']},
+    'ru': {'name': 'Russian', 'flag': '🇷🇺', 'words': ['и', 'в', 'не', 'на', 'я', 'что', 'он', 'с', 'как', 'а', 'то', 'это', 'по', 'но', 'она', 'к', 'у', 'его', 'из', 'за', 'вы', 'так', 'же', 'от', 'мы', 'было', 'был', 'о', 'ты', 'для', 'все', 'уже', 'только', 'её', 'мне', 'бы', 'если', 'когда', 'есть', 'они', 'до', 'или', 'даже', 'нет', 'ещё', 'очень', 'может', 'быть', 'были', 'чтобы', 'этот', 'который', 'также', 'после', 'году', 'время']},
+    'uk': {'name': 'Ukrainian', 'flag': '🇺🇦', 'words': ['і', 'в', 'не', 'на', 'що', 'я', 'з', 'він', 'як', 'а', 'це', 'та', 'до', 'по', 'але', 'у', 'його', 'ви', 'так', 'же', 'від', 'ми', 'було', 'був', 'про', 'ти', 'для', 'все', 'вже', 'тільки', 'її', 'мені', 'би', 'якщо', 'коли', 'є', 'вони', 'або', 'навіть', 'ні', 'ще', 'дуже', 'може', 'бути', 'були', 'щоб', 'цей', 'який', 'також', 'після', 'їх', 'році', 'україни']},
+    'el': {'name': 'Greek', 'flag': '🇬🇷', 'words': []},
+    'ar': {'name': 'Arabic', 'flag': '🇸🇦', 'words': []},
+    'he': {'name': 'Hebrew', 'flag': '🇮🇱', 'words': []},
+    'hi': {'name': 'Hindi', 'flag': '🇮🇳', 'words': []},
+    'ja': {'name': 'Japanese', 'flag': '🇯🇵', 'words': []},
+    'zh': {'name': 'Chinese', 'flag': '🇨🇳', 'words': []},
+    'ko': {'name': 'Korean', 'flag': '🇰🇷', 'words': []},
+    'th': {'name': 'Thai', 'flag': '🇹🇭', 'words': []},
 }
 
+# Everyday and business prose per language (different from anything used to
+# evaluate detection); with the stop words above it forms the trigram profiles,
+# so content words are scored as well as function words
+LANGUAGE_SAMPLES = {
+    'en': "The old railway station was restored last spring and now houses a small museum, a bakery and a "
+          "bicycle repair shop. Visitors can walk along the river to the castle, which was built in the twelfth "
+          "century by a family of merchants. Doctors recommend drinking plenty of water, sleeping at least seven "
+          "hours a night and walking for half an hour every day. The school board decided to buy new computers "
+          "for the library after parents raised money at the summer fair. Heavy rain flooded several streets "
+          "near the harbour, and the council has promised to repair the drains before winter. My grandmother "
+          "keeps her favourite recipes in a notebook she has written by hand over many years. The team scored "
+          "twice in the second half and won the championship for the first time since the club was founded. "
+          "Scientists are studying how bees find their way home, using tiny sensors attached to their backs. "
+          "The directors approved the annual budget and asked the finance department to prepare a report on "
+          "rising costs. Our customers can now track their parcels online and change the delivery date "
+          "themselves. Please let me know whether the meeting on Thursday still suits you, otherwise we can "
+          "move it to next week.",
+    'es': "La antigua estación de tren fue restaurada la primavera pasada y ahora alberga un pequeño museo, una "
+          "panadería y un taller de bicicletas. Los visitantes pueden caminar junto al río hasta el castillo, que "
+          "fue construido en el siglo doce por una familia de comerciantes. Los médicos recomiendan beber mucha "
+          "agua, dormir al menos siete horas cada noche y caminar media hora todos los días. El consejo escolar "
+          "decidió comprar ordenadores nuevos para la biblioteca después de que los padres reunieran dinero en "
+          "la feria de verano. Las fuertes lluvias inundaron varias calles cerca del puerto y el ayuntamiento ha "
+          "prometido arreglar los desagües antes del invierno. Mi abuela guarda sus recetas favoritas en un "
+          "cuaderno que ha escrito a mano durante muchos años. El equipo marcó dos veces en la segunda parte y "
+          "ganó el campeonato por primera vez desde que se fundó el club. Los científicos estudian cómo las "
+          "abejas encuentran el camino a casa con pequeños sensores pegados a la espalda. La dirección aprobó el "
+          "presupuesto anual y pidió al departamento financiero un informe sobre el aumento de los costes. "
+          "Nuestros clientes ya pueden seguir sus paquetes en línea y cambiar ellos mismos la fecha de entrega. "
+          "Dígame si la reunión del jueves le sigue viniendo bien; si no, podemos pasarla a la semana que viene.",
+    'fr': "L'ancienne gare a été restaurée au printemps dernier et abrite maintenant un petit musée, une "
+          "boulangerie et un atelier de réparation de vélos. Les visiteurs peuvent marcher le long de la rivière "
+          "jusqu'au château, construit au douzième siècle par une famille de marchands. Les médecins conseillent "
+          "de boire beaucoup d'eau, de dormir au moins sept heures par nuit et de marcher une demi-heure chaque "
+          "jour. Le conseil d'école a décidé d'acheter de nouveaux ordinateurs pour la bibliothèque après que "
+          "les parents ont récolté de l'argent à la fête d'été. De fortes pluies ont inondé plusieurs rues près "
+          "du port, et la mairie a promis de réparer les égouts avant l'hiver. Ma grand-mère garde ses recettes "
+          "préférées dans un carnet qu'elle a écrit à la main pendant de nombreuses années. L'équipe a marqué "
+          "deux fois en seconde période et a gagné le championnat pour la première fois depuis la fondation du "
+          "club. Les scientifiques étudient comment les abeilles retrouvent leur chemin grâce à de minuscules "
+          "capteurs collés sur leur dos. La direction a approuvé le budget annuel et a demandé au service "
+          "financier un rapport sur la hausse des coûts. Nos clients peuvent désormais suivre leurs colis en "
+          "ligne et modifier eux-mêmes la date de livraison. Dites-moi si la réunion de jeudi vous convient "
+          "toujours, sinon nous pouvons la déplacer à la semaine prochaine.",
+    'de': "Der alte Bahnhof wurde im letzten Frühjahr renoviert und beherbergt jetzt ein kleines Museum, eine "
+          "Bäckerei und eine Fahrradwerkstatt. Besucher können am Fluss entlang bis zur Burg spazieren, die im "
+          "zwölften Jahrhundert von einer Kaufmannsfamilie gebaut wurde. Ärzte empfehlen, viel Wasser zu "
+          "trinken, mindestens sieben Stunden pro Nacht zu schlafen und jeden Tag eine halbe Stunde zu gehen. "
+          "Der Schulrat beschloss, neue Computer für die Bibliothek zu kaufen, nachdem die Eltern beim "
+          "Sommerfest Geld gesammelt hatten. Starker Regen überflutete mehrere Straßen in der Nähe des Hafens, "
+          "und die Stadt hat versprochen, die Abflüsse vor dem Winter zu reparieren. Meine Großmutter bewahrt "
+          "ihre Lieblingsrezepte in einem Heft auf, das sie über viele Jahre von Hand geschrieben hat. Die "
+          "Mannschaft traf zweimal in der zweiten Halbzeit und gewann zum ersten Mal seit der Gründung des "
+          "Vereins die Meisterschaft. Wissenschaftler untersuchen, wie Bienen mit winzigen Sensoren auf dem "
+          "Rücken den Weg nach Hause finden. Die Geschäftsführung genehmigte das Jahresbudget und bat die "
+          "Finanzabteilung um einen Bericht über die steigenden Kosten. Unsere Kunden können ihre Pakete jetzt "
+          "online verfolgen und den Liefertermin selbst ändern. Bitte sagen Sie mir, ob Ihnen der Termin am "
+          "Donnerstag noch passt, sonst können wir ihn auf nächste Woche verschieben.",
+    'it': "La vecchia stazione ferroviaria è stata restaurata la primavera scorsa e ora ospita un piccolo museo, "
+          "una panetteria e un'officina per biciclette. I visitatori possono camminare lungo il fiume fino al "
+          "castello, costruito nel dodicesimo secolo da una famiglia di mercanti. I medici consigliano di bere "
+          "molta acqua, dormire almeno sette ore a notte e camminare mezz'ora ogni giorno. Il consiglio "
+          "scolastico ha deciso di comprare nuovi computer per la biblioteca dopo che i genitori hanno raccolto "
+          "soldi alla festa d'estate. Le forti piogge hanno allagato diverse strade vicino al porto e il comune "
+          "ha promesso di riparare gli scarichi prima dell'inverno. Mia nonna conserva le sue ricette preferite "
+          "in un quaderno che ha scritto a mano in tanti anni. La squadra ha segnato due volte nel secondo tempo "
+          "e ha vinto il campionato per la prima volta dalla fondazione della società. Gli scienziati studiano "
+          "come le api trovano la strada di casa grazie a piccoli sensori attaccati sulla schiena. La direzione "
+          "ha approvato il bilancio annuale e ha chiesto all'ufficio finanziario una relazione sull'aumento dei "
+          "costi. I nostri clienti possono ora seguire i pacchi online e cambiare da soli la data di consegna. "
+          "Mi faccia sapere se la riunione di giovedì le va ancora bene, altrimenti possiamo spostarla alla "
+          "settimana prossima.",
+    'pt': "A antiga estação ferroviária foi restaurada na primavera passada e agora abriga um pequeno museu, "
+          "uma padaria e uma oficina de bicicletas. Os visitantes podem caminhar ao longo do rio até ao castelo, "
+          "construído no século doze por uma família de comerciantes. Os médicos recomendam beber muita água, "
+          "dormir pelo menos sete horas por noite e caminhar meia hora todos os dias. O conselho da escola "
+          "decidiu comprar computadores novos para a biblioteca depois de os pais terem angariado dinheiro na "
+          "feira de verão. As chuvas fortes inundaram várias ruas perto do porto e a câmara prometeu reparar os "
+          "esgotos antes do inverno. A minha avó guarda as suas receitas favoritas num caderno que escreveu à "
+          "mão ao longo de muitos anos. A equipa marcou duas vezes na segunda parte e ganhou o campeonato pela "
+          "primeira vez desde a fundação do clube. Os cientistas estudam como as abelhas encontram o caminho "
+          "para casa com pequenos sensores colados nas costas. A direção aprovou o orçamento anual e pediu ao "
+          "departamento financeiro um relatório sobre o aumento dos custos. Os nossos clientes já podem "
+          "acompanhar as encomendas na internet e mudar eles próprios a data de entrega. Diga-me se a reunião "
+          "de quinta-feira ainda lhe convém; caso contrário, podemos passá-la para a próxima semana.",
+    'nl': "Het oude treinstation werd afgelopen voorjaar gerestaureerd en huisvest nu een klein museum, een "
+          "bakkerij en een fietsenmaker. Bezoekers kunnen langs de rivier naar het kasteel wandelen, dat in de "
+          "twaalfde eeuw door een koopmansfamilie werd gebouwd. Artsen raden aan veel water te drinken, minstens "
+          "zeven uur per nacht te slapen en elke dag een half uur te wandelen. Het schoolbestuur besloot nieuwe "
+          "computers voor de bibliotheek te kopen nadat ouders geld hadden ingezameld op het zomerfeest. Zware "
+          "regen zette verschillende straten bij de haven onder water, en de gemeente heeft beloofd de riolering "
+          "voor de winter te herstellen. Mijn oma bewaart haar lievelingsrecepten in een schrift dat ze in de "
+          "loop van vele jaren met de hand heeft geschreven. Het elftal scoorde twee keer in de tweede helft en "
+          "won voor het eerst sinds de oprichting van de club het kampioenschap. Wetenschappers onderzoeken hoe "
+          "bijen met kleine sensoren op hun rug de weg naar huis vinden. De directie keurde de jaarbegroting "
+          "goed en vroeg de financiële afdeling om een rapport over de stijgende kosten. Onze klanten kunnen hun "
+          "pakketten nu online volgen en zelf de leverdatum wijzigen. Laat u mij weten of de vergadering van "
+          "donderdag nog uitkomt, anders kunnen we die naar volgende week verplaatsen.",
+    'sv': "Den gamla järnvägsstationen renoverades i våras och rymmer nu ett litet museum, ett bageri och en "
+          "cykelverkstad. Besökarna kan promenera längs ån till slottet, som byggdes på tolvhundratalet av en "
+          "köpmannasläkt. Läkare rekommenderar att man dricker mycket vatten, sover minst sju timmar per natt "
+          "och promenerar en halvtimme varje dag. Skolans ledning beslutade att köpa nya datorer till "
+          "biblioteket efter att föräldrarna samlat in pengar på sommarfesten. Kraftigt regn översvämmade flera "
+          "gator nära hamnen, och kommunen har lovat att laga avloppen före vintern. Min mormor förvarar sina "
+          "favoritrecept i en anteckningsbok som hon har skrivit för hand under många år. Laget gjorde två mål "
+          "i andra halvlek och vann mästerskapet för första gången sedan klubben grundades. Forskare undersöker "
+          "hur bin hittar hem med hjälp av små sensorer som fästs på ryggen. Ledningen godkände årets budget "
+          "och bad ekonomiavdelningen om en rapport om de stigande kostnaderna. Våra kunder kan nu följa sina "
+          "paket på nätet och själva ändra leveransdagen. Säg till om mötet på torsdag fortfarande passar, "
+          "annars kan vi flytta det till nästa vecka. Vi köpte färsk fisk på torget och åt middag på balkongen "
+          "medan solen gick ner.",
+    'da': "Den gamle banegård blev restaureret sidste forår og rummer nu et lille museum, et bageri og et "
+          "cykelværksted. De besøgende kan gå langs åen til slottet, som blev bygget i det tolvte århundrede af "
+          "en købmandsslægt. Lægerne anbefaler at drikke rigeligt med vand, sove mindst syv timer om natten og "
+          "gå en halv time hver dag. Skolens ledelse besluttede at købe nye computere til biblioteket, efter at "
+          "forældrene havde samlet penge ind ved sommerfesten. Kraftig regn oversvømmede flere gader nær havnen, "
+          "og kommunen har lovet at reparere kloakkerne før vinteren. Min mormor opbevarer sine "
+          "yndlingsopskrifter i en notesbog, som hun har skrevet i hånden gennem mange år. Holdet scorede to "
+          "gange i anden halvleg og vandt mesterskabet for første gang siden klubben blev grundlagt. Forskere "
+          "undersøger, hvordan bier finder hjem ved hjælp af små sensorer, der sidder på ryggen. Ledelsen "
+          "godkendte årets budget og bad økonomiafdelingen om en rapport om de stigende omkostninger. Vores "
+          "kunder kan nu følge deres pakker på nettet og selv ændre leveringsdatoen. Sig til, hvis mødet på "
+          "torsdag stadig passer, ellers kan vi flytte det til næste uge. Vi købte frisk fisk på torvet og "
+          "spiste aftensmad på altanen, mens solen gik ned.",
+    'no': "Den gamle jernbanestasjonen ble restaurert i fjor vår og huser nå et lite museum, et bakeri og et "
+          "sykkelverksted. De besøkende kan gå langs elva til slottet, som ble bygget på tolvhundretallet av en "
+          "kjøpmannsslekt. Legene anbefaler å drikke mye vann, sove minst sju timer om natta og gå en halvtime "
+          "hver dag. Skolens ledelse bestemte seg for å kjøpe nye datamaskiner til biblioteket etter at "
+          "foreldrene hadde samlet inn penger på sommerfesten. Kraftig regn oversvømte flere gater nær havna, "
+          "og kommunen har lovet å reparere avløpene før vinteren. Mormoren min oppbevarer favorittoppskriftene "
+          "sine i en notatbok som hun har skrevet for hånd gjennom mange år. Laget scoret to ganger i andre "
+          "omgang og vant mesterskapet for første gang siden klubben ble stiftet. Forskere undersøker hvordan "
+          "bier finner veien hjem ved hjelp av små sensorer som er festet på ryggen. Ledelsen godkjente årets "
+          "budsjett og ba økonomiavdelingen om en rapport om de økende kostnadene. Kundene våre kan nå følge "
+          "pakkene sine på nettet og selv endre leveringsdatoen. Si fra om møtet på torsdag fortsatt passer, "
+          "ellers kan vi flytte det til neste uke. Vi kjøpte fersk fisk på torget og spiste middag på "
+          "balkongen mens sola gikk ned.",
+    'fi': "Vanha rautatieasema kunnostettiin viime keväänä, ja siellä toimii nyt pieni museo, leipomo ja "
+          "polkupyöräkorjaamo. Kävijät voivat kävellä joen vartta linnaan, jonka eräs kauppiassuku rakensi "
+          "kahdennellatoista vuosisadalla. Lääkärit suosittelevat juomaan paljon vettä, nukkumaan vähintään "
+          "seitsemän tuntia yössä ja kävelemään puoli tuntia joka päivä. Koulun johto päätti ostaa kirjastoon "
+          "uusia tietokoneita, kun vanhemmat olivat keränneet rahaa kesäjuhlilla. Rankkasade tulvi useille "
+          "kaduille sataman lähellä, ja kaupunki on luvannut korjata viemärit ennen talvea. Isoäitini säilyttää "
+          "lempireseptejään vihkossa, jonka hän on kirjoittanut käsin monen vuoden aikana. Joukkue teki kaksi "
+          "maalia toisella puoliajalla ja voitti mestaruuden ensimmäistä kertaa seuran perustamisen jälkeen. "
+          "Tutkijat selvittävät, miten mehiläiset löytävät kotiin pienten selkään kiinnitettyjen anturien "
+          "avulla. Johto hyväksyi vuoden talousarvion ja pyysi taloushallintoa laatimaan raportin kasvavista "
+          "kustannuksista. Asiakkaamme voivat nyt seurata pakettejaan verkossa ja muuttaa toimituspäivää itse. "
+          "Kertokaa, sopiiko torstain kokous vielä teille, muuten voimme siirtää sen ensi viikkoon.",
+    'pl': "Stary dworzec kolejowy odnowiono zeszłej wiosny i teraz mieści się w nim małe muzeum, piekarnia i "
+          "warsztat rowerowy. Zwiedzający mogą spacerować wzdłuż rzeki aż do zamku, który w dwunastym wieku "
+          "zbudowała rodzina kupców. Lekarze zalecają picie dużej ilości wody, spanie co najmniej siedmiu godzin "
+          "na dobę i codzienny półgodzinny spacer. Dyrekcja szkoły postanowiła kupić nowe komputery do "
+          "biblioteki, gdy rodzice zebrali pieniądze na letnim festynie. Ulewne deszcze zalały kilka ulic w "
+          "pobliżu portu, a gmina obiecała naprawić kanalizację przed zimą. Moja babcia trzyma ulubione przepisy "
+          "w zeszycie, który przez wiele lat pisała ręcznie. Drużyna strzeliła dwa gole w drugiej połowie i po "
+          "raz pierwszy od założenia klubu zdobyła mistrzostwo. Naukowcy badają, jak pszczoły znajdują drogę do "
+          "domu, za pomocą maleńkich czujników przyklejonych do ich grzbietów. Zarząd zatwierdził roczny budżet "
+          "i poprosił dział finansowy o raport na temat rosnących kosztów. Nasi klienci mogą teraz śledzić "
+          "swoje paczki w internecie i samodzielnie zmieniać termin dostawy. Proszę dać znać, czy czwartkowe "
+          "spotkanie nadal Panu odpowiada, w przeciwnym razie przeniesiemy je na przyszły tydzień.",
+    'cs': "Staré nádraží bylo loni na jaře opraveno a nyní v něm sídlí malé muzeum, pekárna a dílna na opravu "
+          "kol. Návštěvníci se mohou projít podél řeky až k hradu, který ve dvanáctém století postavil kupecký "
+          "rod. Lékaři doporučují pít hodně vody, spát alespoň sedm hodin denně a každý den se půl hodiny "
+          "procházet. Vedení školy se rozhodlo koupit do knihovny nové počítače poté, co rodiče vybrali peníze "
+          "na letní slavnosti. Silný déšť zaplavil několik ulic u přístavu a obec slíbila opravit kanalizaci "
+          "ještě před zimou. Moje babička uchovává své oblíbené recepty v sešitě, který psala ručně po mnoho "
+          "let. Tým skóroval dvakrát ve druhém poločase a poprvé od založení klubu vyhrál mistrovství. Vědci "
+          "zkoumají, jak včely nacházejí cestu domů, pomocí drobných čidel připevněných na jejich zádech. "
+          "Vedení schválilo roční rozpočet a požádalo finanční oddělení o zprávu o rostoucích nákladech. Naši "
+          "zákazníci nyní mohou sledovat své balíky na internetu a sami měnit datum doručení. Dejte mi prosím "
+          "vědět, zda vám čtvrteční schůzka stále vyhovuje, jinak ji můžeme přesunout na příští týden.",
+    'tr': "Eski tren istasyonu geçen bahar restore edildi ve şimdi küçük bir müze, bir fırın ve bir bisiklet "
+          "tamirhanesi barındırıyor. Ziyaretçiler nehir boyunca, on ikinci yüzyılda tüccar bir aile tarafından "
+          "yaptırılan kaleye kadar yürüyebilir. Doktorlar bol su içmeyi, gecede en az yedi saat uyumayı ve her "
+          "gün yarım saat yürümeyi öneriyor. Okul yönetimi, veliler yaz şenliğinde para topladıktan sonra "
+          "kütüphane için yeni bilgisayarlar almaya karar verdi. Şiddetli yağmur limana yakın birçok sokağı su "
+          "altında bıraktı ve belediye kanalizasyonu kıştan önce onarma sözü verdi. Büyükannem en sevdiği "
+          "tarifleri yıllar boyunca elle yazdığı bir defterde saklıyor. Takım ikinci yarıda iki gol attı ve "
+          "kulübün kuruluşundan bu yana ilk kez şampiyon oldu. Bilim insanları arıların sırtlarına yapıştırılan "
+          "küçük sensörlerle eve yolu nasıl bulduklarını araştırıyor. Yönetim yıllık bütçeyi onayladı ve mali "
+          "işler biriminden artan maliyetler hakkında bir rapor istedi. Müşterilerimiz artık kargolarını "
+          "internetten takip edip teslimat tarihini kendileri değiştirebiliyor. Perşembe günkü toplantı hâlâ "
+          "size uyuyorsa haber verin, yoksa onu gelecek haftaya alabiliriz.",
+    'id': "Stasiun kereta api tua itu dipugar pada musim semi lalu dan kini menampung sebuah museum kecil, toko "
+          "roti, dan bengkel sepeda. Pengunjung dapat berjalan menyusuri sungai sampai ke benteng yang dibangun "
+          "pada abad kedua belas oleh sebuah keluarga pedagang. Dokter menyarankan untuk minum banyak air, tidur "
+          "sedikitnya tujuh jam setiap malam, dan berjalan kaki setengah jam setiap hari. Pihak sekolah "
+          "memutuskan membeli komputer baru untuk perpustakaan setelah para orang tua mengumpulkan uang di bazar "
+          "tahunan. Hujan deras membanjiri beberapa jalan di dekat pelabuhan, dan pemerintah kota berjanji "
+          "memperbaiki saluran air sebelum musim hujan berikutnya. Nenek saya menyimpan resep kesukaannya di "
+          "sebuah buku catatan yang ditulis tangan selama bertahun-tahun. Tim itu mencetak dua gol di babak "
+          "kedua dan menjuarai kompetisi untuk pertama kalinya sejak klub didirikan. Para ilmuwan meneliti "
+          "bagaimana lebah menemukan jalan pulang dengan sensor kecil yang ditempelkan di punggung mereka. "
+          "Direksi menyetujui anggaran tahunan dan meminta bagian keuangan menyusun laporan tentang biaya yang "
+          "terus naik. Pelanggan kami sekarang bisa melacak paket secara daring dan mengubah sendiri tanggal "
+          "pengiriman. Mohon kabari saya apakah rapat hari Kamis masih cocok, kalau tidak kita bisa "
+          "memindahkannya ke minggu depan.",
+    'ro': "Vechea gară a fost restaurată primăvara trecută și găzduiește acum un mic muzeu, o brutărie și un "
+          "atelier de reparat biciclete. Vizitatorii se pot plimba de-a lungul râului până la castel, construit "
+          "în secolul al doisprezecelea de o familie de negustori. Medicii recomandă să bem multă apă, să dormim "
+          "cel puțin șapte ore pe noapte și să mergem pe jos o jumătate de oră în fiecare zi. Conducerea școlii a "
+          "hotărât să cumpere calculatoare noi pentru bibliotecă după ce părinții au strâns bani la serbarea de "
+          "vară. Ploile puternice au inundat mai multe străzi din apropierea portului, iar primăria a promis că "
+          "va repara canalizarea înainte de iarnă. Bunica mea își păstrează rețetele preferate într-un caiet "
+          "scris de mână de-a lungul multor ani. Echipa a marcat de două ori în repriza a doua și a câștigat "
+          "campionatul pentru prima dată de la înființarea clubului. Oamenii de știință studiază cum își găsesc "
+          "albinele drumul spre casă cu ajutorul unor senzori minusculi lipiți pe spatele lor. Conducerea a "
+          "aprobat bugetul anual și a cerut departamentului financiar un raport despre creșterea costurilor. "
+          "Clienții noștri își pot urmări acum coletele online și pot schimba singuri data livrării. Spuneți-mi "
+          "dacă ședința de joi vă mai convine, altfel o putem muta săptămâna viitoare.",
+    'hu': "A régi vasútállomást tavaly tavasszal felújították, és most egy kis múzeum, egy pékség és egy "
+          "kerékpárszerviz működik benne. A látogatók a folyó mentén sétálhatnak el a várig, amelyet a "
+          "tizenkettedik században egy kereskedőcsalád épített. Az orvosok azt javasolják, hogy igyunk sok "
+          "vizet, aludjunk legalább hét órát éjszakánként, és sétáljunk naponta fél órát. Az iskola vezetése "
+          "úgy döntött, hogy új számítógépeket vesz a könyvtárba, miután a szülők pénzt gyűjtöttek a nyári "
+          "ünnepségen. Az erős eső több utcát elárasztott a kikötő közelében, és az önkormányzat megígérte, "
+          "hogy tél előtt megjavítja a csatornákat. A nagymamám a kedvenc receptjeit egy füzetben tartja, "
+          "amelyet sok éven át kézzel írt. A csapat kétszer talált be a második félidőben, és a klub alapítása "
+          "óta először nyerte meg a bajnokságot. A kutatók azt vizsgálják, hogyan találnak haza a méhek a "
+          "hátukra ragasztott apró érzékelők segítségével. A vezetés jóváhagyta az éves költségvetést, és "
+          "jelentést kért a pénzügyi osztálytól a növekvő költségekről. Ügyfeleink most már az interneten "
+          "követhetik csomagjaikat, és maguk módosíthatják a szállítás napját. Kérem, jelezze, hogy a "
+          "csütörtöki megbeszélés még megfelel-e, különben áttehetjük a jövő hétre.",
+    'ru': "Старый железнодорожный вокзал отреставрировали прошлой весной, и теперь в нём работают небольшой "
+          "музей, пекарня и велосипедная мастерская. Посетители могут пройти вдоль реки до замка, который в "
+          "двенадцатом веке построила купеческая семья. Врачи советуют пить много воды, спать не меньше семи "
+          "часов в сутки и каждый день гулять полчаса. Руководство школы решило купить новые компьютеры для "
+          "библиотеки после того, как родители собрали деньги на летней ярмарке. Сильный дождь затопил "
+          "несколько улиц возле порта, и администрация города обещала отремонтировать канализацию до зимы. Моя "
+          "бабушка хранит любимые рецепты в тетради, которую много лет заполняла от руки. Команда дважды забила "
+          "во втором тайме и впервые с момента основания клуба выиграла чемпионат. Учёные изучают, как пчёлы "
+          "находят дорогу домой, с помощью крошечных датчиков, прикреплённых к их спинам. Руководство "
+          "утвердило годовой бюджет и попросило финансовый отдел подготовить отчёт о растущих расходах. Наши "
+          "клиенты теперь могут отслеживать посылки в интернете и сами менять дату доставки. Сообщите, "
+          "пожалуйста, подходит ли вам ещё встреча в четверг, иначе мы можем перенести её на следующую неделю.",
+    'uk': "Старий залізничний вокзал відреставрували минулої весни, і тепер у ньому працюють невеликий музей, "
+          "пекарня та велосипедна майстерня. Відвідувачі можуть пройти вздовж річки до замку, який у "
+          "дванадцятому столітті збудувала купецька родина. Лікарі радять пити багато води, спати щонайменше "
+          "сім годин на добу й щодня гуляти пів години. Керівництво школи вирішило придбати нові комп'ютери для "
+          "бібліотеки після того, як батьки зібрали гроші на літньому ярмарку. Сильна злива затопила кілька "
+          "вулиць біля порту, і міська рада пообіцяла відремонтувати каналізацію до зими. Моя бабуся зберігає "
+          "улюблені рецепти в зошиті, який багато років заповнювала від руки. Команда двічі забила в другому "
+          "таймі й уперше від заснування клубу виграла чемпіонат. Науковці досліджують, як бджоли знаходять "
+          "дорогу додому, за допомогою крихітних датчиків, прикріплених до їхніх спин. Керівництво затвердило "
+          "річний бюджет і попросило фінансовий відділ підготувати звіт про зростання витрат. Наші клієнти "
+          "тепер можуть відстежувати посилки в інтернеті та самі змінювати дату доставки. Повідомте, будь "
+          "ласка, чи вам ще зручна зустріч у четвер, інакше ми можемо перенести її на наступний тиждень.",
+}
+
+# Languages whose script alone identifies them (or that are written without
+# spaces) are detected from code point ranges instead of trigrams
+SCRIPT_LANGUAGES = {
+    'el': [(0x0370, 0x03FF)],                   # Greek
+    'he': [(0x0590, 0x05FF)],                   # Hebrew
+    'ar': [(0x0600, 0x06FF)],                   # Arabic
+    'hi': [(0x0900, 0x097F)],                   # Devanagari
+    'th': [(0x0E00, 0x0E7F)],                   # Thai
+    'ja': [(0x3040, 0x30FF)],                   # Hiragana / Katakana
+    'ko': [(0x1100, 0x11FF), (0xAC00, 0xD7AF)],  # Hangul
+    'zh': [(0x4E00, 0x9FFF)],                   # CJK ideographs
+}
+
+LANG_SAMPLE_CHARS = 400          # size of each sampled window
+LANG_MAX_SAMPLES = 12            # upper bound on windows read per document
+LANG_MIN_TRIGRAMS = 30           # trigrams required before an early exit
+LANG_MIN_EVIDENCE = 12           # fewer trigrams than this and the language is undetermined
+LANG_MIN_CONFIDENCE = 25         # posterior % below which the language is undetermined
+LANG_CONFIDENCE_THRESHOLD = 0.95 # posterior needed to stop sampling
+LANG_TEMPERATURE = 3.0           # flattens the posterior over summed log-probs
+
+_LANG_TOKEN_RE = re.compile(r'[^\W\d_]+')
+
+def _word_trigrams(word):
+    """Character trigrams of a word padded with spaces"""
+    padded = f' {word} '
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+def _build_language_profiles():
+    """Precompute a (languages x trigrams) matrix of smoothed log-probabilities"""
+    codes = [code for code, lang in LANGUAGE_PATTERNS.items() if lang['words']]
+    counts = []
+    vocab = {}
+    for code in codes:
+        lang_counts = {}
+        words = LANGUAGE_PATTERNS[code]['words'] + _LANG_TOKEN_RE.findall(LANGUAGE_SAMPLES[code].lower())
+        for word in words:
+            for tri in _word_trigrams(word):
+                lang_counts[tri] = lang_counts.get(tri, 0) + 1
+                vocab.setdefault(tri, len(vocab))
+        counts.append(lang_counts)
+
+    matrix = np.zeros((len(codes), len(vocab)), dtype=np.float32)
+    for row, lang_counts in enumerate(counts):
+        for tri, count in lang_counts.items():
+            matrix[row, vocab[tri]] = count
+    totals = matrix.sum(axis=1, keepdims=True)
+    matrix = np.log((matrix + 0.5) / (totals + 0.5 * len(vocab)))
+    return codes, vocab, matrix.astype(np.float32)
+
+LANG_CODES, LANG_TRIGRAM_INDEX, LANG_PROFILES = _build_language_profiles()
+
+def _sample_windows(text):
+    """Yield evenly spaced windows of text, starting with the beginning"""
+    length = len(text)
+    if length <= LANG_SAMPLE_CHARS:
+        yield text
+        return
+    step = max(LANG_SAMPLE_CHARS, length // LANG_MAX_SAMPLES)
+    for start in range(0, length, step)[:LANG_MAX_SAMPLES]:
+        window = text[start:start + LANG_SAMPLE_CHARS]
+        # Drop words cut in half at the window edges (text without spaces is kept whole)
+        if start > 0 and ' ' in window:
+            window = window.partition(' ')[2]
+        if start + LANG_SAMPLE_CHARS < length and ' ' in window:
+            window = window.rpartition(' ')[0]
+        yield window
+
+def _script_language(text):
+    """Return (code, share) when a script-identified language dominates the text"""
+    letters = 0
+    hits = {code: 0 for code in SCRIPT_LANGUAGES}
+    for ch in text:
+        if not ch.isalpha():
+            continue
+        letters += 1
+        cp = ord(ch)
+        for code, ranges in SCRIPT_LANGUAGES.items():
+            if any(lo <= cp <= hi for lo, hi in ranges):
+                hits[code] += 1
+                break
+    if not letters:
+        return None
+    # Japanese text mixes kana with CJK ideographs
+    if hits['ja']:
+        hits['ja'] += hits['zh']
+    code = max(hits, key=hits.get)
+    share = hits[code] / letters
+    return (code, share) if share > 0.3 else None
+
 def analyze_sentiment(text):
     """Analyze sentiment of text"""
     words = re.findall(r'\b[a-z]+\b', text.lower())
@@ -375,6 +2009,70 @@ def analyze_sentiment(text):
         'neutral': round(neutral * 100, 0)
     }
 
+SENTIMENT_TIMELINE_POINTS = 200   # points plotted on the sentiment timeline
+SENTIMENT_MAX_WINDOW = 100        # largest sliding window offered, in sentences
+
+# Token codes for the timeline: 0 other word, 1 positive, 2 negative, 3 sentence end
+_SENTIMENT_CODES = {**{word: 1 for word in POSITIVE_WORDS}, **{word: 2 for word in NEGATIVE_WORDS},
+                    '.': 3, '!': 3, '?': 3}
+
+class SentimentTimeline:
+    """Sentence-level sentiment hits kept as prefix sums
+    
+    The text is tokenized once; pos[i] and neg[i] count the hits in sentences
+    [0, i), so any sentence range or sliding window is scored in O(1).
+    """
+    
+    def __init__(self, text):
+        tokens = re.findall(r'\b[a-z]+\b|[.!?]', text.lower())
+        codes = np.fromiter((_SENTIMENT_CODES.get(token, 0) for token in tokens), np.int8, len(tokens))
+        ends = codes == 3
+        # Sentence number of every token; a terminator belongs to the sentence it ends
+        sentence = np.cumsum(ends) - ends
+        count = int(sentence[-1]) + 1 if len(tokens) else 0
+        # Runs of terminators ("...", "?!") leave sentences without words, which are dropped
+        keep = np.bincount(sentence[~ends], minlength=count) > 0
+        self.pos = self._prefix(np.bincount(sentence[codes == 1], minlength=count)[keep])
+        self.neg = self._prefix(np.bincount(sentence[codes == 2], minlength=count)[keep])
+    
+    @staticmethod
+    def _prefix(hits):
+        return np.concatenate(([0], np.cumsum(hits, dtype=np.int32)))
+    
+    def __len__(self):
+        return len(self.pos) - 1
+    
+    def score(self, start=0, end=None):
+        """Score of sentences [start, end), on the same scale as analyze_sentiment"""
+        end = len(self) if end is None else end
+        positive = int(self.pos[end] - self.pos[start])
+        negative = int(self.neg[end] - self.neg[start])
+        return (positive - negative) / (positive + negative or 1)
+    
+    def window_scores(self, size=1):
+        """Score of every window of size consecutive sentences (size 1 scores each sentence)"""
+        size = max(1, min(size, len(self)))
+        positive = self.pos[size:] - self.pos[:-size]
+        negative = self.neg[size:] - self.neg[:-size]
+        return (positive - negative) / np.maximum(positive + negative, 1)
+    
+    def default_window(self):
+        return max(1, min(len(self) // 20, SENTIMENT_MAX_WINDOW))
+    
+    def turning_points(self, size, limit=5):
+        """Sentences where the windowed sentiment flips between positive and negative
+        
+        Returns the centre sentence of the first window on the new side, for the
+        limit largest swings, in document order.
+        """
+        scores = self.window_scores(size)
+        polar = np.flatnonzero(np.abs(scores) > 0.2)
+        signs = np.sign(scores[polar])
+        flips = np.flatnonzero(signs[1:] != signs[:-1])
+        swings = np.abs(scores[polar[flips + 1]] - scores[polar[flips]])
+        largest = flips[np.argsort(-swings, kind='stable')[:limit]]
+        return sorted(int(polar[flip + 1]) + max(1, min(size, len(self))) // 2 for flip in largest)
+
 def extract_entities(text):
     """Extract named entities from text"""
     entities = []
@@ -411,42 +2109,76 @@ def extract_entities(text):
     
     return entities[:20]
 
-def extract_keywords(text):
-    """Extract keywords from text"""
-    words = re.findall(r'\b[a-z]{4,}\b', text.lower())
-    
-    stop_words = ['this', 'that', 'with', 'from', 'have', 'been', 'were', 'they', 
-                  'their', 'what', 'when', 'where', 'which', 'while', 'about',
-                  'would', 'there', 'could', 'other', 'after', 'first', 'also',
-                  'made', 'many', 'before', 'being', 'through', 'just', 'over',
-                  'such', 'into', 'year', 'some', 'them', 'than', 'then', 'only']
-    
-    freq = {}
-    for word in words:
-        if word not in stop_words:
-            freq[word] = freq.get(word, 0) + 1
-    
-    sorted_words = sorted(freq.items(), key=lambda x: x[1], reverse=True)[:15]
-    total_words = len(words) or 1
-    
-    return [{'text': word, 'relevance': round(count / total_words * 100, 1)} 
-            for word, count in sorted_words]
+def keyword_terms(text):
+    """Count candidate keyword terms: content words and adjacent content-word bigrams"""
+    terms = {}
+    previous = None
+    # Punctuation tokens break adjacency so bigrams never span clauses
+    for word in re.findall(r'[a-z]+|[.!?;:,()]', text.lower()):
+        if len(word) < 3 or word in STOP_WORDS:
+            previous = None
+            continue
+        if len(word) >= 4:
+            terms[word] = terms.get(word, 0) + 1
+        if previous:
+            bigram = f'{previous} {word}'
+            terms[bigram] = terms.get(bigram, 0) + 1
+        previous = word
+    return terms
+
+def extract_keywords(text, top_k=15):
+    """Extract keywords ranked by TF-IDF against the stored corpus"""
+    tf = keyword_terms(text)
+    if not tf:
+        return []
+    
+    total_docs, df = get_document_frequencies(tf)
+    scored = ((count * (math.log((1 + total_docs) / (1 + df.get(term, 0))) + 1), term)
+              for term, count in tf.items())
+    top = heapq.nlargest(top_k, scored)
+    best = top[0][0]
+    
+    return [{'text': term, 'relevance': round(score / best * 100, 1)}
+            for score, term in top]
 
 def detect_language(text):
-    """Detect language of text"""
-    words = text.lower().split()
-    
-    max_score = 0
-    detected = {'code': 'en', 'name': 'English', 'flag': '🇬🇧'}
-    
-    for code, lang in LANGUAGE_PATTERNS.items():
-        score = sum(1 for w in lang['words'] if w in words)
-        if score > max_score:
-            max_score = score
-            detected = {'code': code, 'name': lang['name'], 'flag': lang['flag']}
-    
-    confidence = min(95, 60 + max_score * 5)
-    
+    """Detect language of text from sampled character trigrams
+    
+    Text with too little evidence (e.g. a single word) or no clear winner is
+    reported as undetermined ('und') rather than guessed.
+    """
+    detected = {'code': 'und', 'name': 'Undetermined', 'flag': '🌍'}
+    scores = np.zeros(len(LANG_CODES), dtype=np.float32)
+    seen = 0
+    confidence = 60
+    
+    for window in _sample_windows(text):
+        script = _script_language(window)
+        if script:
+            code, share = script
+            lang = LANGUAGE_PATTERNS[code]
+            return {'code': code, 'name': lang['name'], 'flag': lang['flag'],
+                    'confidence': min(99, round(60 + share * 40))}
+        
+        trigrams = [tri for word in _LANG_TOKEN_RE.findall(window.lower()) for tri in _word_trigrams(word)]
+        seen += len(trigrams)
+        indices = [LANG_TRIGRAM_INDEX[tri] for tri in trigrams if tri in LANG_TRIGRAM_INDEX]
+        if not indices:
+            continue
+        scores += LANG_PROFILES[:, indices].sum(axis=1)
+        
+        # Posterior over languages; stop sampling once it is decisive
+        logits = (scores - scores.max()) / LANG_TEMPERATURE
+        posterior = np.exp(logits) / np.exp(logits).sum()
+        best = int(posterior.argmax())
+        lang = LANGUAGE_PATTERNS[LANG_CODES[best]]
+        detected = {'code': LANG_CODES[best], 'name': lang['name'], 'flag': lang['flag']}
+        confidence = min(99, round(float(posterior[best]) * 100))
+        if seen >= LANG_MIN_TRIGRAMS and posterior[best] >= LANG_CONFIDENCE_THRESHOLD:
+            break
+    
+    if seen < LANG_MIN_EVIDENCE or confidence < LANG_MIN_CONFIDENCE:
+        return {'code': 'und', 'name': 'Undetermined', 'flag': '🌍', 'confidence': 0}
     return {**detected, 'confidence': confidence}
 
 def analyze_emotions(text):
@@ -466,12 +2198,61 @@ def analyze_emotions(text):
     return {emotion: round((count / total) * 100, 0) 
             for emotion, count in emotions.items()}
 
-def summarize_text(text):
-    """Generate a summary of text"""
-    sentences = re.findall(r'[^.!?]+[.!?]+', text) or [text]
-    num_sentences = max(2, int(len(sentences) * 0.3))
+_SENTENCE_RE = re.compile(r'[^.!?。！？؟।]+(?:[.!?。！？؟।]+|$)')
+_SUMMARY_WORD_RE = re.compile(r'\w{3,}')
+SUMMARY_MAX_SENTENCE_WORDS = 80  # longer chosen sentences (or unpunctuated text) are cut
+
+def _sentence_spans(text):
+    """Yield (start, end) offsets of sentences without materializing them"""
+    for match in _SENTENCE_RE.finditer(text):
+        if match.group().strip():
+            yield match.start(), match.end()
+
+def summarize_text(text, length='short'):
+    """Generate an extractive summary of the highest scoring sentences
+    
+    length is 'short', 'medium', 'long' or a sentence count.
+    """
+    k = SUMMARY_LENGTHS.get(length, 3) if isinstance(length, str) else max(1, int(length))
     
-    summary = ' '.join(sentences[:num_sentences]).strip()
+    # Pass 1: corpus term frequencies
+    freq = {}
+    for word in _SUMMARY_WORD_RE.findall(text.lower()):
+        if word not in STOP_WORDS:
+            freq[word] = freq.get(word, 0) + 1
+    max_freq = max(freq.values(), default=1)
+    
+    # Pass 2: score each sentence by the centrality of its terms, keeping the
+    # top-k (score, -position, span) in a min-heap so memory stays bounded by k.
+    # A repeat of a chosen sentence scores the same but sits later, so it is skipped.
+    heap = []
+    chosen = set()
+    for position, (start, end) in enumerate(_sentence_spans(text)):
+        words = _SUMMARY_WORD_RE.findall(text[start:end].lower())
+        if not words:
+            continue
+        key = ' '.join(words)
+        if key in chosen:
+            continue
+        weight = sum(freq.get(word, 0) for word in words) / max_freq
+        score = weight / len(words) ** 0.5
+        item = (score, -position, start, end, key)
+        if len(heap) < k:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            chosen.discard(heapq.heapreplace(heap, item)[4])
+        else:
+            continue
+        chosen.add(key)
+    
+    # Emit chosen sentences in document order; with nothing scored, the opening sentences
+    spans = sorted((start, end) for _, _, start, end, _ in heap) or list(itertools.islice(_sentence_spans(text), k))
+    sentences = []
+    for start, end in spans:
+        words = text[start:end].split(maxsplit=SUMMARY_MAX_SENTENCE_WORDS)
+        sentence = ' '.join(words[:SUMMARY_MAX_SENTENCE_WORDS])
+        sentences.append(sentence + ' …' if len(words) > SUMMARY_MAX_SENTENCE_WORDS else sentence)
+    summary = ' '.join(sentences)
     
     return {
         'summary': summary,
@@ -479,42 +2260,198 @@ def summarize_text(text):
         'summaryWords': len(summary.split())
     }
 
-def extract_text_from_file(uploaded_file):
-    """Extract text from uploaded file"""
+def run_analyses(text, analysis_types, summary_length='short', deadline=None):
+    """Run the selected analyses on text, skipping those not started by deadline (time.monotonic())"""
+    steps = [('sentiment', analyze_sentiment), ('entities', extract_entities), ('keywords', extract_keywords),
+             ('language', detect_language), ('emotions', analyze_emotions),
+             ('summary', lambda text: summarize_text(text, summary_length))]
+    results = {}
+    for analysis_type, analyze in steps:
+        if analysis_type in analysis_types:
+            if deadline is not None and time.monotonic() > deadline:
+                break
+            results[analysis_type] = analyze(text)
+    return results
+
+MINHASH_PERMUTATIONS = 64        # signature length
+LSH_BANDS = 16                   # bands of MINHASH_PERMUTATIONS // LSH_BANDS rows
+SHINGLE_WORDS = 5                # words per shingle
+NEAR_DUPLICATE_THRESHOLD = 0.8   # estimated Jaccard similarity to count as a duplicate
+
+_MINHASH_PRIME = 4294967291      # largest prime below 2**32
+_minhash_rng = np.random.default_rng(1729)
+_MINHASH_A = _minhash_rng.integers(1, 2**31, MINHASH_PERMUTATIONS, dtype=np.uint64)
+_MINHASH_B = _minhash_rng.integers(0, 2**32, MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+def minhash_signature(text):
+    """MinHash signature over word shingles, or None for empty text"""
+    words = re.findall(r'\w+', text.lower())
+    if not words:
+        return None
+    count = max(1, len(words) - SHINGLE_WORDS + 1)
+    hashes = np.unique(np.fromiter(
+        (zlib.crc32(' '.join(words[i:i + SHINGLE_WORDS]).encode()) for i in range(count)),
+        dtype=np.uint64, count=count))
+    
+    # Universal hashing (a*x + b) mod p, applied in chunks to bound memory
+    signature = np.full(MINHASH_PERMUTATIONS, _MINHASH_PRIME, dtype=np.uint64)
+    for i in range(0, len(hashes), 8192):
+        chunk = hashes[i:i + 8192, None]
+        np.minimum(signature, ((chunk * _MINHASH_A + _MINHASH_B) % _MINHASH_PRIME).min(axis=0), out=signature)
+    return signature.astype(np.uint32)
+
+def lsh_bands(signature):
+    """Split a signature into (band, bucket) pairs for LSH lookups"""
+    rows = MINHASH_PERMUTATIONS // LSH_BANDS
+    return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(LSH_BANDS)]
+
+WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+FALLBACK_TAG = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+
+def iter_docx_text(file):
+    """Yield the text of each paragraph and table cell of a DOCX as it is parsed
+    
+    Only word/document.xml is decompressed, streamed through an incremental
+    parser; images and other parts of the archive are never read. Finished
+    body elements are cleared, so memory stays flat however long the document.
+    """
+    with zipfile.ZipFile(file) as archive, archive.open('word/document.xml') as xml:
+        paragraphs = []   # text runs of the open paragraphs (text boxes nest them)
+        cells = []        # paragraphs of the open table cells (tables nest too)
+        depth = 0
+        skip_depth = None  # inside mc:Fallback, which repeats the mc:Choice content
+        body = None
+        for event, elem in ET.iterparse(xml, events=('start', 'end')):
+            tag = elem.tag
+            if event == 'start':
+                depth += 1
+                if skip_depth is not None:
+                    continue
+                if tag == FALLBACK_TAG:
+                    skip_depth = depth
+                elif tag == WORD_NS + 'p':
+                    paragraphs.append([])
+                elif tag == WORD_NS + 'tc':
+                    cells.append([])
+                elif tag == WORD_NS + 'body':
+                    body = elem
+                continue
+            
+            depth -= 1
+            if skip_depth is not None:
+                if depth < skip_depth:
+                    skip_depth = None
+            elif tag == WORD_NS + 't':
+                if paragraphs:
+                    paragraphs[-1].append(elem.text or '')
+            elif tag == WORD_NS + 'tab':
+                if paragraphs:
+                    paragraphs[-1].append('\t')
+            elif tag in (WORD_NS + 'br', WORD_NS + 'cr'):
+                if paragraphs:
+                    paragraphs[-1].append('\n')
+            elif tag == WORD_NS + 'p':
+                text = ''.join(paragraphs.pop())
+                if cells:
+                    cells[-1].append(text)
+                else:
+                    yield text
+            elif tag == WORD_NS + 'tc':
+                text = '\n'.join(p for p in cells.pop() if p)
+                if cells:
+                    cells[-1].append(text)
+                elif text:
+                    yield text
+            
+            # Children of <w:body> sit at depth 2 once closed; drop everything parsed so far
+            if depth == 2 and body is not None:
+                body.clear()
+
+TEXT_CHUNK_BYTES = 4 * 1024 * 1024  # bytes decoded at a time from plain-text files
+
+def iter_text_chunks(file, chunk_bytes=TEXT_CHUNK_BYTES):
+    """Decode a UTF-8 file incrementally, memory-mapping it when it is a real file on disk
+    
+    The raw bytes are never held in full: a mapped file is paged in by the OS and
+    other streams are read a chunk at a time. A leading BOM is dropped and
+    invalid bytes are replaced.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+    # Only open()ed files qualify; archive member streams may proxy the archive's descriptor
+    raw = getattr(file, 'raw', file)
+    size = os.fstat(raw.fileno()).st_size if isinstance(raw, io.FileIO) and file.tell() == 0 else 0
+    
+    if size:
+        with mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for start in range(0, size, chunk_bytes):
+                yield decoder.decode(mapped[start:start + chunk_bytes])
+    else:
+        while True:
+            data = file.read(chunk_bytes)
+            if not data:
+                break
+            yield decoder.decode(data)
+    yield decoder.decode(b'', final=True)
+
+def _take_text(parts, notes, separator=''):
+    """Join text parts until MAX_INPUT_BYTES characters, noting a cut in notes"""
+    taken, size = [], 0
+    for part in parts:
+        if size + len(part) > MAX_INPUT_BYTES:
+            taken.append(part[:MAX_INPUT_BYTES - size])
+            notes.append(f"Only the first {MAX_INPUT_BYTES // 1024 // 1024} MB of text was extracted")
+            break
+        taken.append(part)
+        size += len(part) + len(separator)
+    return separator.join(taken)
+
+def _take_rows(df, notes):
+    """Drop rows past MAX_TABLE_ROWS (read with nrows=MAX_TABLE_ROWS + 1 to detect the cut)"""
+    if len(df) > MAX_TABLE_ROWS:
+        notes.append(f"Only the first {MAX_TABLE_ROWS:,} rows were extracted")
+        df = df.head(MAX_TABLE_ROWS)
+    return df
+
+def extract_text_from_file(uploaded_file, name=None, notes=None):
+    """Extract text from uploaded file (name overrides uploaded_file.name, e.g. for archive members)
+    
+    Extraction stops at the MAX_INPUT_BYTES / MAX_PDF_PAGES / MAX_TABLE_ROWS
+    budgets; a message for each cut is appended to notes.
+    """
+    notes = [] if notes is None else notes
     try:
-        file_type = uploaded_file.name.split('.')[-1].lower()
+        file_type = (name or uploaded_file.name).split('.')[-1].lower()
         
         if file_type == 'txt':
-            return uploaded_file.read().decode('utf-8')
+            return _take_text(iter_text_chunks(uploaded_file), notes)
         elif file_type == 'pdf':
             try:
                 import PyPDF2
                 pdf_reader = PyPDF2.PdfReader(uploaded_file)
-                text = ''
-                for page in pdf_reader.pages:
-                    text += page.extract_text()
-                return text
+                pages = pdf_reader.pages
+                if len(pages) > MAX_PDF_PAGES:
+                    notes.append(f"Only the first {MAX_PDF_PAGES:,} of {len(pages):,} pages were extracted")
+                return _take_text((pages[i].extract_text() for i in range(min(len(pages), MAX_PDF_PAGES))),
+                                  notes)
             except:
                 return "Error: Could not extract text from PDF"
         elif file_type == 'docx':
             try:
-                import docx
-                doc = docx.Document(uploaded_file)
-                return '\n'.join([para.text for para in doc.paragraphs])
+                return _take_text(iter_docx_text(uploaded_file), notes, '\n')
             except:
                 return "Error: Could not extract text from DOCX"
         elif file_type in ['xlsx', 'xls']:
             try:
                 import pandas as pd
-                df = pd.read_excel(uploaded_file)
-                return df.to_string()
+                df = _take_rows(pd.read_excel(uploaded_file, nrows=MAX_TABLE_ROWS + 1), notes)
+                return _take_text([df.to_string()], notes)
             except:
                 return "Error: Could not extract text from Excel file"
         elif file_type == 'csv':
             try:
                 import pandas as pd
-                df = pd.read_csv(uploaded_file)
-                return df.to_string()
+                df = _take_rows(pd.read_csv(uploaded_file, nrows=MAX_TABLE_ROWS + 1), notes)
+                return _take_text([df.to_string()], notes)
             except:
                 return "Error: Could not extract text from CSV"
         else:
@@ -522,6 +2459,80 @@ def extract_text_from_file(uploaded_file):
     except Exception as e:
         return f"Error reading file: {str(e)}"
 
+DOCUMENT_TYPES = ['pdf', 'docx', 'xlsx', 'xls', 'txt', 'csv']
+ARCHIVE_TYPES = ['zip', 'tar', 'gz', 'tgz', 'bz2', 'xz']
+
+def is_archive(name):
+    return name.split('.')[-1].lower() in ARCHIVE_TYPES
+
+def iter_archive_members(file, name):
+    """Yield (member name, file object or None if skipped) for each file in a .zip or .tar(.gz/.bz2/.xz)
+    
+    Members are streamed one at a time without unpacking to disk. Plain text is
+    decoded straight from the archive stream; formats whose parsers need to seek
+    (PDF, DOCX, Excel, CSV) are buffered in memory one member at a time.
+    """
+    def accept(member_name, size):
+        base = member_name.rsplit('/', 1)[-1]
+        return (not base.startswith('.') and '__MACOSX/' not in member_name
+                and base.split('.')[-1].lower() in DOCUMENT_TYPES and size <= MAX_INPUT_BYTES)
+    
+    def prepare(stream, member_name):
+        if member_name.lower().endswith('.txt'):
+            return stream
+        return io.BytesIO(stream.read())
+    
+    if name.lower().endswith('.zip'):
+        with zipfile.ZipFile(file) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                if not accept(info.filename, info.file_size):
+                    yield info.filename, None
+                    continue
+                with archive.open(info) as stream:
+                    yield info.filename, prepare(stream, info.filename)
+    else:
+        # Stream mode reads the (compressed) tar strictly front to back
+        with tarfile.open(fileobj=file, mode='r|*') as archive:
+            for info in archive:
+                if not info.isfile():
+                    continue
+                if not accept(info.name, info.size):
+                    yield info.name, None
+                    continue
+                yield info.name, prepare(archive.extractfile(info), info.name)
+
+def iter_batch_documents(files):
+    """Yield (source name, file object or None if skipped) for uploaded files, expanding archives
+    
+    Documents over MAX_INPUT_BYTES are skipped; archives themselves may be larger.
+    """
+    for file in files:
+        if is_archive(file.name):
+            for member_name, member in iter_archive_members(file, file.name):
+                yield f"{file.name}/{member_name}", member
+        else:
+            yield file.name, file if file.size <= MAX_INPUT_BYTES else None
+
+def analyze_batch_document(user_id, source, text):
+    """Sentiment-analyze one batch document under the admission budgets, reusing a stored near-duplicate
+    
+    Returns (sentiment, duplicate, notes on any sampling).
+    """
+    with admit_analysis(user_id, text) as plan, profile_analysis('batch', source, text, ['sentiment']):
+        signature = minhash_signature(plan['text'])
+        duplicate = find_near_duplicate(user_id, signature)
+        if duplicate and 'sentiment' in duplicate['analysis_types']:
+            # Reused results are not saved again, like on the Analyze page
+            duplicate['reused'] = True
+            sentiment = get_analysis_results(duplicate['id'])['sentiment']
+        else:
+            sentiment = analyze_sentiment(plan['text'])
+            save_analysis(user_id, source, plan['text'], ['sentiment'], {'sentiment': sentiment},
+                          signature=signature, word_count=plan['tokens'])
+    return sentiment, duplicate, plan['notes']
+
 def get_file_icon(filename):
     """Get emoji icon for file type"""
     ext = filename.split('.')[-1].lower()
@@ -531,10 +2542,81 @@ def get_file_icon(filename):
         'xlsx': '📗',
         'xls': '📗',
         'txt': '📄',
-        'csv': '📊'
+        'csv': '📊',
+        'zip': '🗜️',
+        'gz': '🗜️',
+        'tgz': '🗜️',
+        'tar': '🗜️'
     }
     return icons.get(ext, '📄')
 
+# ==================== ANALYSIS REQUESTS ====================
+# What the Analyze and Batch pages do per request, shared with the ingest CLI and load_test.py
+
+def is_extracted(text):
+    """True when extract_text_from_file produced text rather than an error message"""
+    return bool(text) and not text.startswith("Error") and text != "Unsupported file type"
+
+def extract_upload(uploaded_file):
+    """Extract an Analyze page upload; returns (text, notes on any cuts)"""
+    notes = []
+    with profile_analysis('extract', uploaded_file.name, uploaded_file):
+        text = extract_text_from_file(uploaded_file, notes=notes)
+    return text, notes
+
+def run_analysis_request(user_id, session_id, source, text, analysis_types, summary_length='short',
+                         previous_handle=None):
+    """Handle one "Run Analysis" request: admit, analyze or reuse a near-duplicate, save
+    
+    The analyzed text is kept in the TextStore under session_id (replacing
+    previous_handle). Returns a dict with results, notes, duplicate, timeline
+    and text_handle.
+    """
+    with admit_analysis(user_id, text) as plan, profile_analysis('analyze', source, text, analysis_types):
+        analyzed = plan['text']
+        signature = minhash_signature(analyzed)
+        duplicate = find_near_duplicate(user_id, signature)
+        
+        # A near-duplicate that already covers these analyses is reused as-is
+        if duplicate and set(analysis_types) <= set(duplicate['analysis_types']):
+            duplicate['reused'] = True
+            stored = get_analysis_results(duplicate['id'])
+            results = {key: stored[key] for key in analysis_types if key in stored}
+            # The summary length is not stored, so the summary is always redone
+            if 'summary' in analysis_types:
+                results['summary'] = summarize_text(analyzed, summary_length)
+        else:
+            results = run_analyses(analyzed, analysis_types, summary_length, plan['deadline'])
+            skipped = [key for key in analysis_types if key not in results]
+            if skipped:
+                plan['notes'].append(f"Time budget of {ANALYSIS_TIME_BUDGET:.0f}s reached - "
+                                     f"skipped {', '.join(skipped)}")
+            save_analysis(user_id, source, analyzed, list(results), results,
+                          signature=signature, word_count=plan['tokens'])
+        
+        timeline = SentimentTimeline(analyzed) if 'sentiment' in results else None
+    
+    store = get_text_store()
+    if previous_handle is not None:
+        store.discard(previous_handle)
+    return {'results': results, 'notes': plan['notes'], 'duplicate': duplicate, 'timeline': timeline,
+            'text_handle': store.put(session_id, text)}
+
+def process_batch_document(user_id, source, document):
+    """Extract and sentiment-analyze one Batch page document (None when skipped by iter_batch_documents)
+    
+    Returns (sentiment, duplicate, notes), or None if no text could be extracted.
+    """
+    if document is None:
+        return None
+    notes = []
+    with profile_analysis('extract', source, document):
+        text = extract_text_from_file(document, source, notes)
+    if not is_extracted(text):
+        return None
+    sentiment, duplicate, sample_notes = analyze_batch_document(user_id, source, text)
+    return sentiment, duplicate, notes + sample_notes
+
 # ==================== INITIALIZE ====================
 
 # Initialize database
@@ -617,6 +2699,11 @@ def show_main_app():
         
         st.markdown("---")
         if st.button("🚪 Logout", use_container_width=True):
+            get_text_store().drop_session(current_session_id())
+            st.session_state.pop('analysis_results', None)
+            st.session_state.pop('analysis_text_handle', None)
+            st.session_state.pop('sentiment_timeline', None)
+            st.session_state.pop('analysis_notes', None)
             st.session_state.user = None
             st.session_state.page = 'login'
             st.rerun()
@@ -667,7 +2754,7 @@ def show_home_page():
                 col1, col2 = st.columns([3, 1])
                 with col1:
                     st.markdown(f"**{get_file_icon(analysis[2])} {analysis[2]}**")
-                    st.caption(datetime.fromisoformat(analysis[18]).strftime('%Y-%m-%d %H:%M:%S'))
+                    st.caption(datetime.fromisoformat(analysis[19]).strftime('%Y-%m-%d %H:%M:%S'))
                 with col2:
                     sentiment_class = ""
                     if analysis[7] and 'Positive' in analysis[7]:
@@ -694,17 +2781,22 @@ def show_analyze_page():
         source = "Text Input"
         
         if input_type == "📝 Enter Text":
-            text = st.text_area("Enter or paste your text here", height=300, 
+            text = st.text_area("Enter or paste your text here", height=300, max_chars=MAX_INPUT_BYTES,
                                placeholder="Enter or paste your text here for analysis...")
         else:
             uploaded_file = st.file_uploader("Upload a file", 
                                             type=['pdf', 'docx', 'xlsx', 'xls', 'txt', 'csv'])
-            if uploaded_file:
+            if uploaded_file and uploaded_file.size > MAX_INPUT_BYTES:
+                st.error(f"This file is {uploaded_file.size / 1024 / 1024:.0f} MB; files up to "
+                         f"{MAX_INPUT_BYTES // 1024 // 1024} MB can be analyzed")
+            elif uploaded_file:
                 source = uploaded_file.name
                 with st.spinner("Extracting text from file..."):
-                    text = extract_text_from_file(uploaded_file)
+                    text, extract_notes = extract_upload(uploaded_file)
+                    for note in extract_notes:
+                        st.warning(f"✂️ {note}")
                     if text:
-                        st.success(f"✓ Extracted {len(text.split())} words")
+                        st.success(f"✓ Extracted {estimate_tokens(text):,} words")
                         with st.expander("Preview extracted text"):
                             st.text(text[:500] + "..." if len(text) > 500 else text)
         
@@ -715,6 +2807,9 @@ def show_analyze_page():
         language = st.checkbox("🌍 Language Detection")
         emotions = st.checkbox("❤️ Emotion Detection")
         summary = st.checkbox("📄 Summarization")
+        summary_length = "short"
+        if summary:
+            summary_length = st.select_slider("Summary length", options=list(SUMMARY_LENGTHS), value="short")
         
         if st.button("🔬 Run Analysis", use_container_width=True, type="primary"):
             if not text.strip():
@@ -732,27 +2827,14 @@ def show_analyze_page():
                     st.error("Please select at least one analysis type")
                 else:
                     with st.spinner("Analyzing text..."):
-                        results = {}
-                        
-                        if 'sentiment' in analysis_types:
-                            results['sentiment'] = analyze_sentiment(text)
-                        if 'entities' in analysis_types:
-                            results['entities'] = extract_entities(text)
-                        if 'keywords' in analysis_types:
-                            results['keywords'] = extract_keywords(text)
-                        if 'language' in analysis_types:
-                            results['language'] = detect_language(text)
-                        if 'emotions' in analysis_types:
-                            results['emotions'] = analyze_emotions(text)
-                        if 'summary' in analysis_types:
-                            results['summary'] = summarize_text(text)
-                        
-                        # Save to database
-                        save_analysis(st.session_state.user['id'], source, text, analysis_types, results)
-                        
-                        # Store results in session state
-                        st.session_state.analysis_results = results
-                        st.session_state.analysis_text = text
+                        request = run_analysis_request(st.session_state.user['id'], current_session_id(), source,
+                                                       text, analysis_types, summary_length,
+                                                       st.session_state.get('analysis_text_handle'))
+                        st.session_state.analysis_results = request['results']
+                        st.session_state.analysis_notes = request['notes']
+                        st.session_state.sentiment_timeline = request['timeline']
+                        st.session_state.analysis_text_handle = request['text_handle']
+                        st.session_state.analysis_duplicate = request['duplicate']
                         st.success("✓ Analysis complete!")
                         st.rerun()
     
@@ -763,7 +2845,18 @@ def show_analyze_page():
             st.info("Run an analysis to see results here")
         else:
             results = st.session_state.analysis_results
-            text = st.session_state.analysis_text
+            duplicate = st.session_state.get('analysis_duplicate')
+            
+            for note in st.session_state.get('analysis_notes', []):
+                st.warning(f"✂️ {note}")
+            
+            if duplicate:
+                similarity = int(duplicate['similarity'] * 100)
+                if duplicate.get('reused'):
+                    st.info(f"♻️ Near-duplicate of **{duplicate['source']}** ({similarity}% similar) - "
+                            "showing the stored results")
+                else:
+                    st.warning(f"⚠️ Near-duplicate of **{duplicate['source']}** ({similarity}% similar)")
             
             # Sentiment
             if 'sentiment' in results:
@@ -779,6 +2872,24 @@ def show_analyze_page():
                     st.progress(int(results['sentiment']['positive']) / 100, text=f"Positive: {results['sentiment']['positive']}%")
                     st.progress(int(results['sentiment']['negative']) / 100, text=f"Negative: {results['sentiment']['negative']}%")
                     st.progress(int(results['sentiment']['neutral']) / 100, text=f"Neutral: {results['sentiment']['neutral']}%")
+                    
+                    timeline = st.session_state.get('sentiment_timeline')
+                    if timeline is not None and len(timeline) > 1:
+                        st.markdown("**Sentiment through the document**")
+                        window = st.slider("Window (sentences)", 1, min(len(timeline), SENTIMENT_MAX_WINDOW),
+                                           timeline.default_window(),
+                                           help="1 scores each sentence on its own; larger windows smooth the curve")
+                        scores = timeline.window_scores(window)
+                        # Long documents are plotted at evenly spaced windows, centred on their sentences
+                        points = np.unique(np.linspace(0, len(scores) - 1, SENTIMENT_TIMELINE_POINTS).astype(int))
+                        import pandas as pd
+                        st.line_chart(pd.DataFrame({'Sentiment': scores[points]},
+                                                   index=pd.Index(points + window // 2 + 1, name='Sentence')))
+                        turns = timeline.turning_points(window)
+                        if turns:
+                            st.caption("Sentiment turns near sentence " + ", ".join(str(turn + 1) for turn in turns))
+                        else:
+                            st.caption(f"No sentiment turns across {len(timeline):,} sentences")
             
             # Entities
             if 'entities' in results and results['entities']:
@@ -834,18 +2945,25 @@ def show_analyze_page():
                         reduction = int((1 - results['summary']['summaryWords'] / results['summary']['originalWords']) * 100)
                         st.metric("Reduction", f"{reduction}%")
             
-            # Text preview
-            with st.expander("📄 Analyzed Text", expanded=True):
-                st.text_area("", text[:5000], height=200, disabled=True)
+            # Text preview, loaded from the session store only on request
+            with st.expander("📄 Analyzed Text"):
+                if st.toggle("Show analyzed text"):
+                    text = get_text_store().get(st.session_state.get('analysis_text_handle'))
+                    if text is None:
+                        st.info("The analyzed text is no longer held for this session.")
+                    else:
+                        st.text_area("", text[:5000], height=200, disabled=True)
 
 # ==================== BATCH PAGE ====================
 
+BATCH_RESULT_ROWS = 200  # documents listed individually on the Batch page
+
 def show_batch_page():
     st.markdown("# 📦 Batch Analysis")
-    st.markdown("Upload multiple files for bulk analysis")
+    st.markdown("Upload multiple files, or .zip / .tar.gz archives of them, for bulk analysis")
     
     uploaded_files = st.file_uploader("Upload files", 
-                                     type=['pdf', 'docx', 'xlsx', 'xls', 'txt', 'csv'],
+                                     type=DOCUMENT_TYPES + ARCHIVE_TYPES,
                                      accept_multiple_files=True)
     
     if uploaded_files:
@@ -855,27 +2973,51 @@ def show_batch_page():
             progress_bar = st.progress(0)
             status_text = st.empty()
             results_container = st.container()
+            totals = {'analyzed': 0, 'reused': 0, 'skipped': 0, 'Positive': 0, 'Negative': 0, 'Neutral': 0}
+            st.caption(f"Documents over {MAX_INPUT_BYTES // 1024 // 1024} MB are skipped")
             
             for idx, file in enumerate(uploaded_files):
-                progress = (idx + 1) / len(uploaded_files)
-                progress_bar.progress(progress)
-                status_text.text(f"Processing {file.name}...")
-                
-                text = extract_text_from_file(file)
-                if text and not text.startswith("Error"):
-                    sentiment = analyze_sentiment(text)
-                    save_analysis(st.session_state.user['id'], file.name, text, ['sentiment'], {'sentiment': sentiment})
-                    
-                    with results_container:
-                        col1, col2 = st.columns([3, 1])
-                        with col1:
-                            st.markdown(f"**{get_file_icon(file.name)} {file.name}**")
-                        with col2:
-                            st.markdown(f"**{sentiment['label']}** (Score: {sentiment['score']})")
-                        st.divider()
+                try:
+                    for source, document in iter_batch_documents([file]):
+                        status_text.text(f"Processing {source}...")
+                        processed = process_batch_document(st.session_state.user['id'], source, document)
+                        if processed is None:
+                            totals['skipped'] += 1
+                            continue
+                        
+                        sentiment, duplicate, notes = processed
+                        totals['analyzed'] += 1
+                        totals['reused'] += bool(duplicate and duplicate.get('reused'))
+                        totals[sentiment['label'].split()[0]] += 1
+                        
+                        # Archives can hold thousands of documents; only the first ones get a row
+                        if totals['analyzed'] <= BATCH_RESULT_ROWS:
+                            with results_container:
+                                col1, col2 = st.columns([3, 1])
+                                with col1:
+                                    st.markdown(f"**{get_file_icon(source)} {source}**")
+                                    if duplicate:
+                                        reused = " - stored result reused" if duplicate.get('reused') else ""
+                                        st.caption(f"♻️ Near-duplicate of {duplicate['source']} "
+                                                   f"({int(duplicate['similarity'] * 100)}% similar){reused}")
+                                    for note in notes:
+                                        st.caption(f"✂️ {note}")
+                                with col2:
+                                    st.markdown(f"**{sentiment['label']}** (Score: {sentiment['score']})")
+                                st.divider()
+                except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as e:
+                    st.error(f"Could not read archive {file.name}: {e}")
+                progress_bar.progress((idx + 1) / len(uploaded_files))
             
             status_text.text("✓ All files processed!")
-            st.success("Batch analysis complete!")
+            saved = totals['analyzed'] - totals['reused']
+            if totals['analyzed'] > BATCH_RESULT_ROWS:
+                st.caption(f"Showing the first {BATCH_RESULT_ROWS} of {totals['analyzed']:,} documents; "
+                           f"the {saved:,} new analyses are in your history.")
+            st.success(f"Batch analysis complete! {totals['analyzed']:,} analyzed "
+                       f"(😊 {totals['Positive']:,} · 😔 {totals['Negative']:,} · 😐 {totals['Neutral']:,}): "
+                       f"{saved:,} saved to history, {totals['reused']:,} near-duplicates reused stored results, "
+                       f"{totals['skipped']:,} skipped")
 
 # ==================== API PAGE ====================
 
@@ -961,14 +3103,34 @@ print(result)""", language="python")
 def show_history_page():
     st.markdown("# 📜 Your Analysis History")
     
-    analyses = get_user_analyses(st.session_state.user['id'])
+    user_id = st.session_state.user['id']
     
-    col1, col2 = st.columns([3, 1])
+    # Load the newest page once, then only add what the change feed reports on top
+    feed = st.session_state.get('history_feed')
+    if feed is None or feed['user_id'] != user_id:
+        rows, cursor = get_analyses_since([0] * STORAGE.shard_count, user_id, limit=HISTORY_PAGE_ROWS)
+        feed = st.session_state.history_feed = {'user_id': user_id, 'cursor': cursor, 'rows': rows[::-1]}
+    else:
+        rows, feed['cursor'] = get_analyses_since(feed['cursor'], user_id, limit=HISTORY_PAGE_ROWS)
+        if rows:
+            feed['rows'] = (rows[::-1] + feed['rows'])[:HISTORY_PAGE_ROWS]
+    analyses = feed['rows']
+    total = get_user_stats(user_id)['total']
+    
+    col1, col2, col3 = st.columns([3, 1, 1])
     with col1:
-        st.markdown(f"Showing {len(analyses)} analysis record(s) for {st.session_state.user['name']}")
+        if total > len(analyses):
+            st.markdown(f"Showing the {len(analyses)} most recent of {total:,} analysis records "
+                        f"for {st.session_state.user['name']}")
+        else:
+            st.markdown(f"Showing {len(analyses)} analysis record(s) for {st.session_state.user['name']}")
     with col2:
+        live = st.toggle("📡 Live updates", key="history_live",
+                         help=f"Check for new analyses every {FEED_POLL_SECONDS} seconds")
+    with col3:
         if st.button("🗑️ Clear History", use_container_width=True):
-            clear_user_analyses(st.session_state.user['id'])
+            clear_user_analyses(user_id)
+            st.session_state.pop('history_feed', None)
             st.success("History cleared!")
             st.rerun()
     
@@ -983,82 +3145,328 @@ def show_history_page():
             with st.container():
                 col1, col2, col3, col4 = st.columns([2, 2, 1, 1])
                 with col1:
-                    st.markdown(f"**{get_file_icon(analysis[2])} {analysis[2]}**")
-                    st.caption(datetime.fromisoformat(analysis[18]).strftime('%Y-%m-%d %H:%M:%S'))
+                    st.markdown(f"**{get_file_icon(analysis['source'])} {analysis['source']}**")
+                    st.caption(datetime.fromisoformat(analysis['created_at']).strftime('%Y-%m-%d %H:%M:%S'))
                 with col2:
-                    st.markdown(f"**Types:** {analysis[5]}")
+                    st.markdown(f"**Types:** {analysis['analysis_types']}")
                 with col3:
                     sentiment_emoji = ""
-                    if analysis[7] and 'Positive' in analysis[7]:
+                    if analysis['sentiment_label'] and 'Positive' in analysis['sentiment_label']:
                         sentiment_emoji = "😊"
-                    elif analysis[7] and 'Negative' in analysis[7]:
+                    elif analysis['sentiment_label'] and 'Negative' in analysis['sentiment_label']:
                         sentiment_emoji = "😔"
                     else:
                         sentiment_emoji = "😐"
-                    st.markdown(f"{sentiment_emoji} **{analysis[7] or 'N/A'}**")
+                    st.markdown(f"{sentiment_emoji} **{analysis['sentiment_label'] or 'N/A'}**")
                 with col4:
-                    st.markdown(f"**{analysis[4]} words**")
+                    st.markdown(f"**{analysis['word_count']} words**")
                 st.divider()
+    
+    if live:
+        time.sleep(FEED_POLL_SECONDS)
+        st.rerun()
 
 # ==================== ADMIN PAGE ====================
 
 def show_admin_page():
     st.markdown("# 👑 Admin Dashboard")
     
-    stats = get_admin_stats()
+    col1, col2, col3 = st.columns([4, 1, 1])
+    with col2:
+        live = st.toggle("📡 Live updates", key="admin_live",
+                         help=f"Check for new analyses every {FEED_POLL_SECONDS} seconds. "
+                              "Analytics, export and the analyses grid are paused while live.")
+    with col3:
+        refresh = st.button("🔄 Refresh Data", use_container_width=True)
+    
+    # Counters come from a full count whenever the page is (re)entered or used, since
+    # deletes never reach the change feed; live polls only add the rows the feed reports
+    polled = st.session_state.pop('admin_polled', False)
+    feed = st.session_state.get('admin_feed')
+    if feed is None or refresh:
+        cursor = feed_cursor()
+        feed = st.session_state.admin_feed = {'cursor': cursor, 'stats': dict(get_admin_stats(cursor)),
+                                              'recent': [], 'new': 0}
+    else:
+        rows, feed['cursor'] = get_analyses_since(feed['cursor'])
+        if not polled:
+            feed['stats'] = dict(get_admin_stats(feed['cursor']))
+        elif rows:
+            stats = feed['stats']
+            stats['totalAnalyses'] += len(rows)
+            stats['positive'] += sum('Positive' in (row['sentiment_label'] or '') for row in rows)
+            stats['negative'] += sum('Negative' in (row['sentiment_label'] or '') for row in rows)
+        if rows:
+            feed['new'] += len(rows)
+            feed['recent'] = (rows[::-1] + feed['recent'])[:FEED_RECENT_ROWS]
+    stats = feed['stats']
     
     col1, col2, col3, col4 = st.columns(4)
     with col1:
         st.metric("👥 Total Users", stats['totalUsers'])
     with col2:
-        st.metric("📊 Total Analyses", stats['totalAnalyses'])
+        st.metric("📊 Total Analyses", stats['totalAnalyses'], delta=feed['new'] or None,
+                  help="Delta: analyses added since the last refresh")
     with col3:
         st.metric("😊 Positive Results", stats['positive'])
     with col4:
         st.metric("😔 Negative Results", stats['negative'])
     
+    if feed['recent']:
+        st.markdown("### 🟢 Live Activity")
+        names = get_user_names(row['user_id'] for row in feed['recent'])
+        st.dataframe([{'User': names.get(row['user_id'], ('?', ''))[0], 'Source': row['source'],
+                       'Analyses': row['analysis_types'], 'Sentiment': row['sentiment_label'],
+                       'Words': row['word_count'], 'Created': row['created_at']} for row in feed['recent']],
+                     use_container_width=True, hide_index=True)
+    
+    if live:
+        st.caption(f"📡 Live - checking for new analyses every {FEED_POLL_SECONDS} seconds")
+        time.sleep(FEED_POLL_SECONDS)
+        st.session_state.admin_polled = True
+        st.rerun()
+    
+    with st.expander("🧠 Server Memory"):
+        usage = get_text_store().usage()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Process RSS", f"{process_memory() / 1024 / 1024:.0f} MB")
+        with col2:
+            st.metric("Session Texts (memory)", f"{usage['memoryBytes'] / 1024 / 1024:.1f} MB")
+        with col3:
+            st.metric("Session Texts (disk)", f"{usage['diskBytes'] / 1024 / 1024:.1f} MB")
+        with col4:
+            st.metric("Stored Texts", f"{usage['entries']} / {usage['sessions']} sessions")
+        cache = get_query_cache().usage()
+        lookups = cache['hits'] + cache['misses']
+        st.caption(f"Query cache: {cache['entries']} result(s), {cache['bytes'] / 1024 / 1024:.1f} MB, "
+                   f"{cache['hits'] / (lookups or 1):.0%} hit rate over {lookups:,} lookups")
+        admission = get_admission_controller().usage()
+        st.caption(f"Heavy analyses: {admission['running']} of {admission['slots']} slot(s) busy, "
+                   f"{admission['waiting']} waiting, {admission['admitted']:,} admitted, "
+                   f"{admission['sampled']:,} sampled, {admission['timedOut']:,} gave up waiting")
+    
+    with st.expander("🐢 Slow Analyses"):
+        log = get_slow_analysis_log()
+        
+        def apply_slow_threshold():
+            enabled = st.session_state.slow_profiling
+            log.threshold_ms = float(st.session_state.slow_threshold_ms) if enabled else 0
+        
+        col1, col2 = st.columns([1, 2])
+        with col1:
+            st.toggle("Profile analyses", value=log.enabled, key="slow_profiling", on_change=apply_slow_threshold,
+                      help="Runs cProfile around every analysis while on, which slows analyses down")
+        with col2:
+            st.number_input("Slow threshold (ms)", min_value=1, step=100, key="slow_threshold_ms",
+                            value=int(log.threshold_ms or SLOW_ANALYSIS_DEFAULT_MS), on_change=apply_slow_threshold)
+        
+        records = log.records()
+        if not records:
+            st.caption("No slow analyses recorded" + ("" if log.enabled else " - profiling is off"))
+        else:
+            st.dataframe([{'ID': r['id'], 'Kind': r['kind'], 'Source': r['source'], 'Type': r['type'],
+                           'KB': round(r['bytes'] / 1024, 1), 'Chars': r['chars'],
+                           'Analyses': ', '.join(r['analysisTypes']), 'ms': r['milliseconds'],
+                           'Profiled': r['profile'] is not None, 'Error': r['error'],
+                           'Created': r['createdAt']} for r in records],
+                         use_container_width=True, hide_index=True)
+            by_id = {r['id']: r for r in records}
+            selected = by_id[st.selectbox("Profile", list(by_id),
+                                          format_func=lambda i: f"#{i} {by_id[i]['source']} "
+                                                                f"({by_id[i]['milliseconds']:,} ms)")]
+            st.code(selected['summary'], language=None)
+            col1, col2 = st.columns(2)
+            with col1:
+                if selected['profile'] is not None:
+                    st.download_button("⬇️ Download .prof", selected['profile'],
+                                       file_name=f"slow_analysis_{selected['id']}.prof",
+                                       mime="application/octet-stream",
+                                       help="Open with python -m pstats or snakeviz")
+            with col2:
+                if st.button("🗑️ Clear Slow Analyses"):
+                    log.clear()
+                    st.rerun()
+    
+    st.markdown("---")
+    st.markdown("### 📈 Analytics")
+    periods = {"All time": None, "Last 30 days": 30, "Last 7 days": 7}
+    period = st.selectbox("Period", list(periods), label_visibility="collapsed")
+    days = periods[period]
+    
+    tab1, tab2, tab3 = st.tabs(["🏷️ Top Entities", "🔑 Top Keywords", "❤️ Emotions"])
+    with tab1:
+        entity_type = st.selectbox("Entity type", ["All", "PERSON", "ORGANIZATION", "LOCATION", "EMAIL", "URL"])
+        top_entities = get_top_entities(None if entity_type == "All" else entity_type, days)
+        if top_entities:
+            st.dataframe(top_entities, use_container_width=True, hide_index=True)
+        else:
+            st.info("No entities recorded for this period.")
+    with tab2:
+        top_keywords = get_top_keywords(days)
+        if top_keywords:
+            st.dataframe(top_keywords, use_container_width=True, hide_index=True)
+        else:
+            st.info("No keywords recorded for this period.")
+    with tab3:
+        distribution = get_emotion_distribution(days)
+        if distribution:
+            import pandas as pd
+            st.bar_chart(pd.Series({emotion: values['average'] for emotion, values in distribution.items()},
+                                   name="Average %"))
+        else:
+            st.info("No emotions recorded for this period.")
+    
+    st.markdown("---")
+    with st.expander("📤 Export Analyses"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            fmt = st.selectbox("Format", list(EXPORT_FORMATS))
+            user_email = st.text_input("User email", placeholder="All users")
+        with col2:
+            start_date = st.date_input("From", value=None)
+            end_date = st.date_input("To", value=None)
+        with col3:
+            sentiment = st.selectbox("Sentiment", ["All", "Positive", "Negative", "Neutral"])
+        
+        if st.button("📦 Prepare Export"):
+            os.makedirs(EXPORT_DIR, exist_ok=True)
+            path = os.path.join(EXPORT_DIR, f"analyses_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}")
+            with st.spinner("Exporting..."):
+                with open(path, 'wb') as out:
+                    rows = export_analyses(out, fmt, user_email=user_email.strip() or None,
+                                           start_date=start_date, end_date=end_date,
+                                           sentiment=None if sentiment == "All" else sentiment)
+            st.session_state.admin_export = (path, rows)
+            prune_exports()
+        
+        if 'admin_export' in st.session_state:
+            path, rows = st.session_state.admin_export
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if not size:
+                st.info(f"`{path}` has been removed to make room for newer exports.")
+            else:
+                st.success(f"✓ Exported {rows} row(s) to `{path}` ({size / 1024 / 1024:.1f} MB)")
+            # The file is only read into memory for the run after an explicit request;
+            # the rerun that follows the download drops it again
+            if 0 < size <= EXPORT_DOWNLOAD_LIMIT:
+                if st.button("🔗 Prepare Download"):
+                    with open(path, 'rb') as f:
+                        st.download_button("⬇️ Download", f, file_name=os.path.basename(path),
+                                           mime=EXPORT_FORMATS[path.rsplit('.', 1)[-1]])
+            elif size:
+                st.info("This export is too large to download through the browser; "
+                        "collect it from the server path above.")
+    
     st.markdown("---")
     st.markdown("### All User Analyses")
     st.caption("Complete analysis history from all users (SQL Database)")
     
-    if st.button("🔄 Refresh Data", use_container_width=False):
-        st.rerun()
+    col1, col2, col3, col4 = st.columns([3, 2, 2, 1])
+    with col1:
+        search = st.text_input("Search", placeholder="User, email or source")
+    with col2:
+        sentiment = st.selectbox("Sentiment filter", ["All", "Positive", "Negative", "Neutral"])
+    with col3:
+        sort = st.selectbox("Sort by", ADMIN_GRID_SORTS)
+    with col4:
+        descending = st.toggle("Descending", value=True)
     
-    analyses = get_all_analyses()
+    filters = {'search': search.strip() or None, 'sentiment': None if sentiment == "All" else sentiment}
+    total = count_analyses(**filters)
     
-    if not analyses:
-        st.info("No analyses yet. Users will appear here once they start analyzing.")
+    if not total:
+        if any(filters.values()):
+            st.info("No analyses match these filters.")
+        else:
+            st.info("No analyses yet. Users will appear here once they start analyzing.")
     else:
-        # Create a table
-        for analysis in analyses:
-            with st.container():
-                col1, col2, col3, col4, col5, col6 = st.columns([2, 2, 2, 1, 1, 2])
-                with col1:
-                    st.markdown(f"**👤 {analysis[20]}**")
-                    st.caption(analysis[21])
-                with col2:
-                    st.markdown(f"{get_file_icon(analysis[2])} {analysis[2]}")
-                with col3:
-                    st.caption(analysis[5])
-                with col4:
-                    sentiment_emoji = ""
-                    if analysis[7] and 'Positive' in analysis[7]:
-                        sentiment_emoji = "😊"
-                    elif analysis[7] and 'Negative' in analysis[7]:
-                        sentiment_emoji = "😔"
-                    else:
-                        sentiment_emoji = "😐"
-                    st.markdown(f"{sentiment_emoji}")
-                with col5:
-                    st.markdown(f"{analysis[4]} words")
-                with col6:
-                    st.caption(datetime.fromisoformat(analysis[18]).strftime('%Y-%m-%d %H:%M'))
-                st.divider()
+        pages = -(-total // ADMIN_GRID_PAGE_ROWS)
+        page = 0
+        if pages > 1:
+            # Label, key and bounds are fixed: in this Streamlit they make up the widget id,
+            # and a changing id would send the admin back to page 1 whenever the row count moves
+            page = min(st.number_input("Page", min_value=1, value=1, key="admin_grid_page"), pages) - 1
+        grid = get_admin_grid(sort, descending, page, **filters)
+        st.caption(f"Showing {page * ADMIN_GRID_PAGE_ROWS + 1:,}-{page * ADMIN_GRID_PAGE_ROWS + len(grid):,} "
+                   f"of {total:,} analyses (page {page + 1} of {pages})")
+        st.dataframe(grid, use_container_width=True, hide_index=True, height=420,
+                     column_config={
+                         'Score': st.column_config.NumberColumn(format="%.2f"),
+                         'Words': st.column_config.NumberColumn(format="%d"),
+                         'Created': st.column_config.DatetimeColumn(format="YYYY-MM-DD HH:mm"),
+                     })
 
 # ==================== MAIN ====================
 
+def run_ingest(user_email, paths):
+    """Batch-analyze documents and archives on disk; plain-text files are memory-mapped"""
+    user = get_user_by_email(user_email)
+    if user is None:
+        print(f"No user with email {user_email}", file=sys.stderr)
+        return 1
+    
+    analyzed = skipped = 0
+    for path in paths:
+        try:
+            with open(path, 'rb') as file:
+                documents = (iter_archive_members(file, path) if is_archive(path)
+                             else [(os.path.basename(path),
+                                    file if os.path.getsize(path) <= MAX_INPUT_BYTES else None)])
+                for name, document in documents:
+                    source = f"{os.path.basename(path)}/{name}" if is_archive(path) else name
+                    processed = process_batch_document(user['id'], source, document)
+                    if processed is None:
+                        skipped += 1
+                        continue
+                    sentiment, _, notes = processed
+                    analyzed += 1
+                    print(f"{source}\t{sentiment['label']}\t{sentiment['score']}")
+                    for note in notes:
+                        print(f"{source}: {note}", file=sys.stderr)
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as e:
+            print(f"Could not read {path}: {e}", file=sys.stderr)
+            skipped += 1
+    print(f"Analyzed {analyzed} document(s), skipped {skipped}", file=sys.stderr)
+    return 0
+
+def run_cli(argv):
+    """Command line entry point: python app.py export|ingest ..."""
+    import argparse
+    parser = argparse.ArgumentParser(prog="app.py", description="Document Analyzer maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    export = commands.add_parser("export", help="stream analyses to a CSV, JSONL or Parquet file")
+    export.add_argument("--format", choices=list(EXPORT_FORMATS), default="csv")
+    export.add_argument("--output", required=True, help="output file path, or - for stdout")
+    export.add_argument("--user", help="only analyses by this user email")
+    export.add_argument("--since", help="first day to include (YYYY-MM-DD)")
+    export.add_argument("--until", help="last day to include (YYYY-MM-DD)")
+    export.add_argument("--sentiment", choices=["Positive", "Negative", "Neutral"])
+    
+    ingest = commands.add_parser("ingest", help="batch-analyze files and .zip/.tar.gz archives from disk")
+    ingest.add_argument("--user", required=True, help="email of the user the analyses belong to")
+    ingest.add_argument("paths", nargs="+", help="documents or archives")
+    args = parser.parse_args(argv)
+    
+    if args.command == "ingest":
+        return run_ingest(args.user, args.paths)
+    
+    filters = {'user_email': args.user, 'start_date': args.since, 'end_date': args.until,
+               'sentiment': args.sentiment}
+    if args.output == '-':
+        rows = export_analyses(sys.stdout.buffer, args.format, **filters)
+    else:
+        with open(args.output, 'wb') as out:
+            rows = export_analyses(out, args.format, **filters)
+    print(f"Exported {rows} row(s)", file=sys.stderr)
+    return 0
+
 if __name__ == "__main__":
-    if st.session_state.user is None:
+    if get_script_run_ctx() is None:
+        # Invoked with plain `python app.py ...` rather than `streamlit run`
+        sys.exit(run_cli(sys.argv[1:]))
+    elif st.session_state.user is None:
         show_login_page()
     else:
         show_main_app()
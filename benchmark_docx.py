@@ -0,0 +1,157 @@
+"""
+Document Analyzer - DOCX Extraction Benchmark
+
+Builds a synthetic DOCX (paragraphs, tables and embedded images) and compares
+the streaming extractor used by the app (iter_docx_text) with the python-docx
+DOM on throughput and peak memory. Each extractor runs in its own subprocess
+so its peak RSS is measured in isolation.
+
+Usage:
+    python benchmark_docx.py --paragraphs 200000 --tables 2000 --images 20
+    python benchmark_docx.py --file contract.docx
+
+The app is imported against a throwaway database so document_analyzer.db is never touched.
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from xml.sax.saxutils import escape
+
+EXTRACTORS = ['streaming', 'python-docx']
+WORDS = ['contract', 'party', 'agreement', 'shall', 'payment', 'term', 'notice', 'liability',
+         'confidential', 'services', 'delivery', 'schedule', 'clause', 'warranty', 'governing']
+
+# ==================== SYNTHETIC DOCUMENT ====================
+
+CONTENT_TYPES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Default Extension="png" ContentType="image/png"/>
+<Override PartName="/word/document.xml"
+ ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+</Types>'''
+
+PACKAGE_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Target="word/document.xml"
+ Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>
+</Relationships>'''
+
+IMAGE_REL = ('<Relationship Id="rIdImg{0}" Target="media/image{0}.png" '
+             'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"/>')
+
+def _sentence(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 24))).capitalize() + '.'
+
+def _paragraph(text):
+    return f'<w:p><w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+def build_docx(path, paragraphs, tables, images, image_bytes, rng):
+    """Write a DOCX with the given number of paragraphs, 4x3 tables and image parts"""
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', CONTENT_TYPES)
+        archive.writestr('_rels/.rels', PACKAGE_RELS)
+        archive.writestr('word/_rels/document.xml.rels',
+                         '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                         '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                         + ''.join(IMAGE_REL.format(i) for i in range(images)) + '</Relationships>')
+        for i in range(images):
+            # Random bytes do not compress, like real photos
+            archive.writestr(f'word/media/image{i}.png', rng.randbytes(image_bytes), zipfile.ZIP_STORED)
+
+        table_every = paragraphs // tables if tables else 0
+        with archive.open('word/document.xml', 'w') as xml:
+            xml.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                      b'<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                      b'<w:body>')
+            for i in range(paragraphs):
+                xml.write(_paragraph(_sentence(rng)).encode())
+                if table_every and i % table_every == 0:
+                    rows = ''.join('<w:tr>' + ''.join(f'<w:tc>{_paragraph(_sentence(rng))}</w:tc>' for _ in range(3))
+                                   + '</w:tr>' for _ in range(4))
+                    xml.write(f'<w:tbl>{rows}</w:tbl>'.encode())
+            xml.write(b'</w:body></w:document>')
+
+# ==================== MEASUREMENT ====================
+
+def _peak_rss():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def run_extractor(name, path):
+    """Extract path with one extractor in this process and return its measurements"""
+    with tempfile.TemporaryDirectory() as scratch:
+        os.environ['DOCUMENT_ANALYZER_DB'] = os.path.join(scratch, 'benchmark.db')
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import app
+        import docx
+
+        baseline = app.process_memory()
+        started = time.perf_counter()
+        if name == 'streaming':
+            text = '\n'.join(app.iter_docx_text(path))
+        else:
+            # The extraction extract_text_from_file used before streaming
+            text = '\n'.join(para.text for para in docx.Document(path).paragraphs)
+        elapsed = time.perf_counter() - started
+        return {'extractor': name, 'seconds': round(elapsed, 3), 'chars': len(text),
+                'peakMemoryBytes': max(0, _peak_rss() - baseline)}
+
+def measure(name, path):
+    """Run one extractor in a fresh interpreter"""
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--run', name, path],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def print_report(path, results):
+    with zipfile.ZipFile(path) as archive:
+        xml_bytes = archive.getinfo('word/document.xml').file_size
+    print(f"\n{path}: {os.path.getsize(path) / 1024 / 1024:.1f} MB file, "
+          f"{xml_bytes / 1024 / 1024:.1f} MB document.xml")
+    print(f"{'extractor':<13}{'seconds':>9}{'MB/s':>9}{'chars':>13}{'peak MB':>10}")
+    for result in results:
+        print(f"{result['extractor']:<13}{result['seconds']:>9}"
+              f"{xml_bytes / 1024 / 1024 / max(result['seconds'], 1e-6):>9.1f}{result['chars']:>13,}"
+              f"{result['peakMemoryBytes'] / 1024 / 1024:>10.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark DOCX text extraction for Document Analyzer")
+    parser.add_argument("--file", help="benchmark an existing DOCX instead of generating one")
+    parser.add_argument("--paragraphs", type=int, default=100000, help="paragraphs in the generated document")
+    parser.add_argument("--tables", type=int, default=1000, help="4x3 tables in the generated document")
+    parser.add_argument("--images", type=int, default=20, help="embedded image parts")
+    parser.add_argument("--image-kb", type=int, default=2048, help="size of each image part in KB")
+    parser.add_argument("--seed", type=int, default=7, help="random seed")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    parser.add_argument("--run", nargs=2, metavar=("EXTRACTOR", "FILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run:
+        print(json.dumps(run_extractor(*args.run)))
+        return 0
+
+    path = args.file
+    if path is None:
+        path = os.path.join(tempfile.gettempdir(), 'document_analyzer_benchmark.docx')
+        print(f"Building {path}: {args.paragraphs} paragraphs, {args.tables} tables, {args.images} images...")
+        build_docx(path, args.paragraphs, args.tables, args.images, args.image_kb * 1024,
+                   random.Random(args.seed))
+
+    results = [measure(name, path) for name in EXTRACTORS]
+    print_report(path, results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,362 @@
+"""
+Document Analyzer - Load Test Harness
+
+Simulates many concurrent sessions against the same functions the Streamlit
+pages call (login, analyze, batch, history, admin) on a seeded SQLite
+database, then reports throughput, latency percentiles and lock waits.
+
+Usage:
+    python load_test.py --sessions 50 --duration 30 --seed-analyses 20000
+    python load_test.py --mix analyze=5,history=3,admin=1 --json report.json
+
+The database defaults to load_test.db so the application database is never touched.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+DEFAULT_MIX = 'login=1,analyze=3,batch=1,history=3,admin=1'
+LOAD_TEST_PASSWORD = 'loadtest'
+
+# ==================== LOCK INSTRUMENTATION ====================
+
+class LockStats:
+    """Thread-safe counters for SQLite lock waits"""
+
+    def __init__(self):
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, timed_out=False):
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds += seconds
+            self.timeouts += int(timed_out)
+
+LOCK_STATS = LockStats()
+
+def _with_lock_retry(operation, timeout):
+    """Run a SQLite operation, retrying while the database is locked"""
+    start = None
+    delay = 0.001
+    while True:
+        try:
+            result = operation()
+            if start is not None:
+                LOCK_STATS.record(time.perf_counter() - start)
+            return result
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) and 'busy' not in str(e):
+                raise
+            now = time.perf_counter()
+            if start is None:
+                start = now
+            elif now - start > timeout:
+                LOCK_STATS.record(now - start, timed_out=True)
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+class CountingCursor(sqlite3.Cursor):
+    """Cursor that counts and times waits on a locked database"""
+
+    def execute(self, sql, parameters=()):
+        return _with_lock_retry(lambda: super(CountingCursor, self).execute(sql, parameters),
+                                self.connection.lock_timeout)
+
+    def executemany(self, sql, seq_of_parameters):
+        rows = list(seq_of_parameters)  # generators cannot be replayed after a retry
+        return _with_lock_retry(lambda: super(CountingCursor, self).executemany(sql, rows),
+                                self.connection.lock_timeout)
+
+class CountingConnection(sqlite3.Connection):
+    """Connection whose lock waits are handled (and counted) in Python instead of by SQLite"""
+
+    lock_timeout = 5.0
+
+    def cursor(self, factory=CountingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def commit(self):
+        return _with_lock_retry(super().commit, self.lock_timeout)
+
+def instrument(app):
+    """Route the app's connections through CountingConnection"""
+    CountingConnection.lock_timeout = app.DB_TIMEOUT
+    app.STORAGE.connect = lambda path: sqlite3.connect(path, timeout=0, factory=CountingConnection)
+
+# ==================== SEEDING ====================
+
+def seed_database(app, users, analyses, rng):
+    """Bulk-insert load test users and synthetic analyses into the app's storage backend"""
+    conn = app.get_connection()
+    c = conn.cursor()
+    password_hash = hashlib.sha256(LOAD_TEST_PASSWORD.encode()).hexdigest()
+    c.executemany("INSERT OR IGNORE INTO users (name, email, password_hash, is_admin, api_key) VALUES (?, ?, ?, ?, ?)",
+                  ((f'Load User {i}', f'loadtest{i}@example.com', password_hash, int(i == 0), str(uuid.uuid4()))
+                   for i in range(users)))
+    c.execute("SELECT id FROM users WHERE email LIKE 'loadtest%@example.com'")
+    user_ids = [row[0] for row in c.fetchall()]
+    conn.commit()
+    conn.close()
+
+    storage = app.STORAGE
+    labels = ['Positive 😊', 'Negative 😔', 'Neutral 😐']
+    now = datetime.utcnow()
+    for index in range(storage.shard_count):
+        shard_users = [user_id for user_id in user_ids if storage.shard_index_for_user(user_id) == index]
+        if not shard_users:
+            continue
+        conn = storage.shard(index)
+        c = conn.cursor()
+        count = analyses * len(shard_users) // len(user_ids)
+        for start in range(0, count, 5000):
+            # Ids on shard k are congruent to k modulo the shard count
+            c.execute("SELECT seq FROM sqlite_sequence WHERE name='analyses'")
+            row = c.fetchone()
+            first_id = (row[0] if row else 0) + 1
+            first_id += (index - first_id) % storage.shard_count
+            rows = []
+            for offset in range(min(5000, count - start)):
+                created = now - timedelta(seconds=rng.randint(0, 90 * 86400))
+                rows.append((first_id + offset * storage.shard_count, rng.choice(shard_users),
+                             f'seed_{rng.randint(0, 10**6)}.txt', 'Seeded analysis', rng.randint(50, 5000),
+                             'sentiment, emotions', round(rng.uniform(-1, 1), 4), rng.choice(labels),
+                             created.strftime('%Y-%m-%d %H:%M:%S')))
+            c.executemany("""INSERT INTO analyses (id, user_id, source, text_preview, word_count, analysis_types,
+                                                   sentiment_score, sentiment_label, created_at)
+                             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""", rows)
+            c.executemany("INSERT INTO analysis_emotions (analysis_id, emotion, score) VALUES (?, ?, ?)",
+                          ((row[0], emotion, rng.choice([0.0, 25.0, 50.0]))
+                           for row in rows for emotion in app.EMOTION_WORDS))
+        conn.commit()
+        conn.close()
+
+# ==================== SESSION ACTIONS ====================
+
+def make_document(app, rng, words):
+    """Synthetic document mixing sentiment words, entities and filler"""
+    vocab = (app.POSITIVE_WORDS + app.NEGATIVE_WORDS + ['report', 'customer', 'quarter', 'Google', 'London',
+             'service', 'delivery', 'product', 'team', 'market'] * 5)
+    sentences = []
+    while words > 0:
+        length = rng.randint(6, 18)
+        sentences.append(' '.join(rng.choice(vocab) for _ in range(length)).capitalize() + '.')
+        words -= length
+    return ' '.join(sentences)
+
+class Upload(io.BytesIO):
+    """In-memory stand-in for Streamlit's UploadedFile (also a BytesIO)"""
+
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+
+class Session:
+    """One simulated user session"""
+
+    def __init__(self, app, rng, email, doc_words, batch_size):
+        self.app = app
+        self.rng = rng
+        self.email = email
+        self.doc_words = doc_words
+        self.batch_size = batch_size
+        self.user = None
+        self.history_cursor = None
+        self.admin_cursor = None
+        self.session_id = uuid.uuid4().hex
+        self.text_handle = None
+
+    def login(self):
+        self.user = self.app.get_user(self.email, LOAD_TEST_PASSWORD)
+
+    def analyze(self):
+        # Half the requests paste text, the other half upload it as a .txt file
+        app = self.app
+        text = make_document(app, self.rng, self.doc_words)
+        source = 'Text Input'
+        if self.rng.random() < 0.5:
+            source = 'upload.txt'
+            text, _ = app.extract_upload(Upload(source, text.encode('utf-8')))
+        types = ['sentiment', 'entities', 'keywords', 'language', 'emotions', 'summary']
+        request = app.run_analysis_request(self.user['id'], self.session_id, source, text, types,
+                                           previous_handle=self.text_handle)
+        self.text_handle = request['text_handle']
+
+    def batch(self):
+        app = self.app
+        for i in range(self.batch_size):
+            source = f'batch_{i}.txt'
+            document = Upload(source, make_document(app, self.rng, self.doc_words).encode('utf-8'))
+            app.process_batch_document(self.user['id'], source, document)
+
+    def history(self):
+        # Like the page: the first visit loads the history, later visits poll the change feed
+        app = self.app
+        app.get_user_stats(self.user['id'])
+        cursor = self.history_cursor or [0] * app.STORAGE.shard_count
+        _, self.history_cursor = app.get_analyses_since(cursor, self.user['id'])
+
+    def admin(self):
+        app = self.app
+        if self.admin_cursor is None:
+            self.admin_cursor = app.feed_cursor()
+            app.get_admin_stats(self.admin_cursor)
+        else:
+            _, self.admin_cursor = app.get_analyses_since(self.admin_cursor)
+        app.count_analyses()
+        app.get_admin_grid()
+        app.get_top_entities()
+        app.get_top_keywords()
+        app.get_emotion_distribution()
+
+# ==================== RUNNER ====================
+
+def parse_mix(mix):
+    """Parse 'action=weight,...' into a dict"""
+    weights = {}
+    for part in mix.split(','):
+        action, _, weight = part.partition('=')
+        action = action.strip()
+        if action not in ('login', 'analyze', 'batch', 'history', 'admin'):
+            raise ValueError(f"Unknown action: {action}")
+        weights[action] = float(weight or 1)
+    return weights
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def run_load_test(app, sessions, duration, weights, users, doc_words, batch_size, think, seed):
+    """Run concurrent sessions for duration seconds and return the report dict"""
+    latencies = {action: [] for action in weights}
+    errors = {action: 0 for action in weights}
+    results_lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    actions, action_weights = list(weights), list(weights.values())
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        session = Session(app, rng, f'loadtest{index % users}@example.com', doc_words, batch_size)
+        session.login()
+        while time.perf_counter() < deadline:
+            action = rng.choices(actions, action_weights)[0]
+            start = time.perf_counter()
+            try:
+                getattr(session, action)()
+                elapsed = time.perf_counter() - start
+                with results_lock:
+                    latencies[action].append(elapsed)
+            except Exception:
+                with results_lock:
+                    errors[action] += 1
+            if think:
+                time.sleep(rng.expovariate(1 / think))
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    report = {'sessions': sessions, 'shards': app.STORAGE.shard_count, 'durationSeconds': round(elapsed, 2), 'actions': {},
+              'lockWaits': LOCK_STATS.waits, 'lockWaitSeconds': round(LOCK_STATS.wait_seconds, 3),
+              'lockTimeouts': LOCK_STATS.timeouts, 'queryCache': app.get_query_cache().usage(),
+              'admission': app.get_admission_controller().usage()}
+    total = 0
+    for action, values in latencies.items():
+        values.sort()
+        total += len(values)
+        report['actions'][action] = {
+            'count': len(values),
+            'errors': errors[action],
+            'throughput': round(len(values) / elapsed, 2),
+            'p50Ms': round(percentile(values, 50) * 1000, 1),
+            'p95Ms': round(percentile(values, 95) * 1000, 1),
+            'p99Ms': round(percentile(values, 99) * 1000, 1),
+            'maxMs': round((values[-1] if values else 0) * 1000, 1),
+        }
+    report['throughput'] = round(total / elapsed, 2)
+    return report
+
+def print_report(report):
+    print(f"\n{report['sessions']} sessions on {report['shards']} shard(s) for {report['durationSeconds']}s - "
+          f"{report['throughput']} ops/s overall")
+    print(f"{'action':<10}{'count':>8}{'errors':>8}{'ops/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for action, stats in report['actions'].items():
+        print(f"{action:<10}{stats['count']:>8}{stats['errors']:>8}{stats['throughput']:>9}"
+              f"{stats['p50Ms']:>10}{stats['p95Ms']:>10}{stats['p99Ms']:>10}{stats['maxMs']:>10}")
+    print(f"SQLite lock waits: {report['lockWaits']} ({report['lockWaitSeconds']}s waiting, "
+          f"{report['lockTimeouts']} timed out)")
+    cache = report['queryCache']
+    print(f"Query cache: {cache['hits']} hits, {cache['misses']} misses, {cache['entries']} entries")
+    admission = report['admission']
+    print(f"Heavy analyses: {admission['admitted']} admitted into {admission['slots']} slot(s), "
+          f"{admission['sampled']} sampled, {admission['timedOut']} gave up waiting")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent load test for Document Analyzer")
+    parser.add_argument("--db", default="load_test.db", help="database file to seed and test against")
+    parser.add_argument("--shards", type=int, default=1, help="analysis shard files (see DOCUMENT_ANALYZER_SHARDS)")
+    parser.add_argument("--sessions", type=int, default=50, help="concurrent simulated sessions")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weighted actions, e.g. " + DEFAULT_MIX)
+    parser.add_argument("--users", type=int, default=20, help="distinct users the sessions log in as")
+    parser.add_argument("--seed-analyses", type=int, default=10000, help="analyses to seed before the run")
+    parser.add_argument("--reseed", action="store_true", help="delete the database and seed it again")
+    parser.add_argument("--doc-words", type=int, default=400, help="words per analyzed document")
+    parser.add_argument("--batch-size", type=int, default=5, help="documents per batch upload")
+    parser.add_argument("--think", type=float, default=0.0, help="mean think time between actions (s)")
+    parser.add_argument("--seed", type=int, default=7, help="random seed")
+    parser.add_argument("--json", help="also write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    base, ext = os.path.splitext(args.db)
+    if args.reseed:
+        for path in [args.db] + [f'{base}.shard{index}{ext}' for index in range(args.shards)]:
+            if os.path.exists(path):
+                os.remove(path)
+    fresh = not os.path.exists(args.db)
+
+    # The app reads its storage configuration at import time
+    os.environ['DOCUMENT_ANALYZER_DB'] = args.db
+    os.environ['DOCUMENT_ANALYZER_SHARDS'] = str(args.shards)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app
+
+    if fresh:
+        print(f"Seeding {args.db}: {args.users} users, {args.seed_analyses} analyses...")
+        seed_database(app, args.users, args.seed_analyses, random.Random(args.seed))
+    instrument(app)
+
+    report = run_load_test(app, args.sessions, args.duration, parse_mix(args.mix), args.users,
+                           args.doc_words, args.batch_size, args.think, args.seed)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())